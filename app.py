@@ -1,9 +1,87 @@
 import streamlit as st
 import json
-from main import run_research_agent
+from jobs import get_runner
 
 st.set_page_config(page_title="Deep Research Agent", layout="wide")
 
+@st.cache_resource(show_spinner="Starting research workers...")
+def load_job_runner():
+    """
+    Starts the research worker pool once per server process. Runs execute in
+    the workers, so they survive reruns and browser refreshes of this script.
+    """
+    return get_runner()
+
+runner = load_job_runner()
+
+def render_result(result_json: str) -> str:
+    """Renders a finished run's result and returns the answer for the chat history."""
+    try:
+        results = json.loads(result_json)
+    except (json.JSONDecodeError, TypeError):
+        st.error("Failed to parse the research results.")
+        return "Sorry, I received an invalid response from the research agent."
+    st.success("Research complete!")
+
+    final_answer = results.get("final_answer", "No final answer found.")
+    sub_queries = results.get("sub_queries", [])
+    sources = results.get("sources_used", [])
+    late_sources = results.get("sources_late", [])
+
+    # Display the main answer first
+    response_content = f"""### 📝 Final Answer
+{final_answer}
+"""
+    st.markdown(response_content)
+
+    # Create a collapsible expander for the research details
+    with st.expander("🔍 View Research Process Details"):
+        st.markdown("---_"*10)
+        if sub_queries:
+            st.markdown("#### ❓ Sub-Queries Generated:")
+            for q in sub_queries:
+                st.markdown(f"- `{q}`")
+            st.markdown("\n")
+
+        if sources:
+            st.markdown("#### 📚 Sources Used:")
+            for i, url in enumerate(sources):
+                st.markdown(f"{i+1}. {url}")
+
+        if late_sources:
+            st.markdown("#### ⏱️ Left Out (missed the scrape deadline):")
+            for url in late_sources:
+                st.markdown(f"- {url}")
+    return response_content
+
+def follow_job(job_id: str) -> str:
+    """
+    Shows a job's progress until it finishes and returns the answer for the
+    chat history. A job picked up again after a rerun is replayed from its
+    first event, so the status and the streamed report are rebuilt.
+    """
+    status_placeholder = st.empty()
+    report_placeholder = st.empty()
+    streamed_report = ""
+    response_content = ""
+
+    for _, event in runner.follow(job_id):
+        if event.get("type") == "status":
+            status_placeholder.info(event["data"])
+        elif event.get("type") == "partial":
+            # Render the report progressively while it is being generated
+            streamed_report += event["data"]
+            report_placeholder.markdown(streamed_report + "▌")
+        elif event.get("type") == "result":
+            status_placeholder.empty() # Clear the status message
+            report_placeholder.empty() # The final answer is rendered below
+            response_content = render_result(event["data"])
+        elif event.get("type") == "error":
+            status_placeholder.empty()
+            st.error(f"An error occurred: {event['data']}")
+            response_content = f"Sorry, I encountered an error: {event['data']}"
+    return response_content
+
 st.title("🧠 Deep Research Agent")
 st.caption("Your AI-powered research assistant. Enter a query to start.")
 
@@ -16,62 +94,37 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# Accept user input
-if prompt := st.chat_input("What would you like to research today?"):
+# The running job lives in the session and in the URL, so a rerun or a browser refresh follows it again
+active_job = st.session_state.get("active_job") or st.query_params.get("job")
+
+# Accept user input; one research job runs per session at a time
+if prompt := st.chat_input("What would you like to research today?", disabled=bool(active_job)):
+    active_job = runner.submit(prompt)
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.messages.append({"role": "user", "content": prompt, "job_id": active_job})
     # Display user message in chat message container
     with st.chat_message("user"):
         st.markdown(prompt)
 
+if active_job:
+    st.session_state.active_job = active_job
+    st.query_params["job"] = active_job
+    if not any(message.get("job_id") == active_job for message in st.session_state.messages):
+        # The page was reloaded while the job ran, so its question is not in this session's history yet
+        job = runner.store.get(active_job)
+        if job is not None:
+            st.session_state.messages.append({"role": "user", "content": job["query"], "job_id": active_job})
+            with st.chat_message("user"):
+                st.markdown(job["query"])
+
     # Display assistant response in chat message container
     with st.chat_message("assistant"):
-        status_placeholder = st.empty()
-        response_content = ""
-
-        for event in run_research_agent(prompt):
-            if event.get("type") == "status":
-                status_placeholder.info(event["data"])
-            elif event.get("type") == "result":
-                status_placeholder.empty() # Clear the status message
-                try:
-                    results = json.loads(event["data"])
-                    st.success("Research complete!")
-
-                    final_answer = results.get("final_answer", "No final answer found.")
-                    sub_queries = results.get("sub_queries", [])
-                    sources = results.get("sources_used", [])
-
-                    # Display the main answer first
-                    response_content = f"""### 📝 Final Answer
-{final_answer}
-"""
-                    st.markdown(response_content)
-
-                    # Create a collapsible expander for the research details
-                    with st.expander("🔍 View Research Process Details"):
-                        st.markdown("---_"*10)
-                        if sub_queries:
-                            st.markdown("#### ❓ Sub-Queries Generated:")
-                            for q in sub_queries:
-                                st.markdown(f"- `{q}`")
-                            st.markdown("\n")
-
-                        if sources:
-                            st.markdown("#### 📚 Sources Used:")
-                            for i, url in enumerate(sources):
-                                st.markdown(f"{i+1}. {url}")
-
-                except (json.JSONDecodeError, TypeError):
-                    st.error("Failed to parse the research results.")
-                    response_content = "Sorry, I received an invalid response from the research agent."
-                break # Exit loop once result is received
-
-            elif event.get("type") == "error":
-                st.error(f"An error occurred: {event['data']}")
-                response_content = f"Sorry, I encountered an error: {event['data']}"
-                break
+        response_content = follow_job(active_job)
 
     # Add the final assistant response to chat history
     if response_content:
         st.session_state.messages.append({"role": "assistant", "content": response_content})
+    st.session_state.active_job = None
+    del st.query_params["job"]
+    # Re-enable the chat input now that the job has finished
+    st.rerun()
@@ -0,0 +1,125 @@
+import sys
+import json
+import math
+import time
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from main import run_research_agent
+from utils.config import env_int
+
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 8)
+
+def read_queries(lines):
+    """
+    Yields (id, query) pairs from JSONL lines. Each line is either a JSON object
+    with a "query" (and optional "id") or a bare JSON string.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"Warning: Skipping line {line_number}, it is not valid JSON.", file=sys.stderr)
+            continue
+        if isinstance(item, str):
+            yield str(line_number), item
+        elif isinstance(item, dict) and item.get("query"):
+            yield str(item.get("id", line_number)), item["query"]
+        else:
+            print(f"Warning: Skipping line {line_number}, it has no query.", file=sys.stderr)
+
+def run_query(query_id: str, query: str) -> dict:
+    """Runs one query through `run_research_agent` and returns its batch record."""
+    start = time.perf_counter()
+    record = {"id": query_id, "query": query}
+    try:
+        for event in run_research_agent(query, stream=False):
+            if event.get("type") == "run":
+                record["run_id"] = event["data"]
+            elif event.get("type") == "result":
+                record["status"] = "ok"
+                record["result"] = json.loads(event["data"])
+                break
+            elif event.get("type") == "error":
+                record["status"] = "error"
+                record["error"] = event["data"]
+                break
+        else:
+            record["status"] = "error"
+            record["error"] = "Research finished without a result."
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+def run_batch(queries, concurrency: int = None):
+    """
+    Runs (id, query) pairs concurrently, at most `concurrency` at a time, and
+    yields each record as soon as its query finishes (completion order). Every
+    run shares the process-wide HTTP pools and caches.
+    """
+    concurrency = max(1, concurrency or BATCH_CONCURRENCY)
+    queries = iter(queries)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            # Keep the pool full without reading the whole input up front
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    query_id, query = next(queries)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(executor.submit(run_query, query_id, query))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def percentile(values: list, fraction: float) -> float:
+    """Returns the nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+def format_report(records: list, wall_time: float) -> str:
+    """Summarizes throughput and per-query latency of a finished batch."""
+    latencies = [record["latency_s"] for record in records]
+    succeeded = sum(1 for record in records if record["status"] == "ok")
+    lines = [
+        "--- Batch Complete ---",
+        f"Queries: {len(records)} ({succeeded} succeeded, {len(records) - succeeded} failed)",
+        f"Wall time: {wall_time:.2f}s, throughput: {len(records) / wall_time if wall_time else 0:.2f} queries/s",
+    ]
+    if latencies:
+        lines.append(
+            f"Latency: mean {sum(latencies) / len(latencies):.2f}s, p50 {percentile(latencies, 0.5):.2f}s, "
+            f"p95 {percentile(latencies, 0.95):.2f}s, max {max(latencies):.2f}s"
+        )
+    return "\n".join(lines)
+
+def main_batch(path: str, concurrency: int = None):
+    """
+    Runs a JSONL batch from `path` ("-" for stdin) and writes one JSON record
+    per line to stdout as queries finish. Progress logs and the final report
+    go to stderr so stdout stays valid JSONL.
+    """
+    output = sys.stdout
+    source = sys.stdin if path == "-" else open(path)
+    records = []
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            for record in run_batch(read_queries(source), concurrency):
+                records.append({"status": record["status"], "latency_s": record["latency_s"]})
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(format_report(records, time.perf_counter() - start), file=sys.stderr)
@@ -0,0 +1,247 @@
+"""
+A local stand-in for the Gemini, SerpApi and Firecrawl endpoints, for driving
+the full research graph offline (CI, benchmarks, local development).
+
+Run it standalone:
+    python benchmarks/fake_server.py --port 8765 --firecrawl-latency-ms 1500
+
+then point the agent at it:
+    GEMINI_API_BASE=http://127.0.0.1:8765/v1beta
+    SERPAPI_URL=http://127.0.0.1:8765/search
+    FIRECRAWL_API_URL=http://127.0.0.1:8765/v0/scrape
+
+Latencies are drawn from a log-normal distribution around the configured
+median, a configurable fraction of calls fail with 429/500, and scraped pages
+are generated at a configurable size.
+"""
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = (
+    "agent graph research planning latency throughput cache token model search "
+    "scrape summary source pipeline benchmark concurrency provider framework state "
+    "workflow evaluation retrieval index quality report analysis data system"
+).split()
+
+@dataclass
+class FakeServerConfig:
+    # Median latency per provider in milliseconds
+    latency_ms: dict = field(default_factory=lambda: {"gemini": 800.0, "serpapi": 300.0, "firecrawl": 1200.0})
+    # Log-normal spread of the latency (0 = always the median)
+    latency_sigma: float = 0.5
+    # Fraction of calls answered with 429 or 500
+    error_rate: float = 0.0
+    # Size of each scraped page in kilobytes
+    page_kb: int = 40
+    # Organic results returned per search
+    results_per_search: int = 10
+    # Scrape steps in generated plans
+    scrapes_per_plan: int = 3
+    # Characters per streamed report chunk
+    stream_chunk_chars: int = 200
+    report_chars: int = 4000
+    seed: int = None
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FakeServerConfig()
+    rng = random.Random()
+    rng_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- helpers ---
+
+    def _sleep(self, provider: str):
+        median = self.config.latency_ms.get(provider, 0) / 1000.0
+        if median <= 0:
+            return
+        with self.rng_lock:
+            factor = math.exp(self.rng.gauss(0, self.config.latency_sigma)) if self.config.latency_sigma else 1.0
+        time.sleep(median * factor)
+
+    def _maybe_fail(self) -> bool:
+        with self.rng_lock:
+            failed = self.rng.random() < self.config.error_rate
+            status = self.rng.choice([429, 500])
+        if failed:
+            self._send_json(status, {"error": "injected failure"}, headers={"Retry-After": "0"} if status == 429 else None)
+        return failed
+
+    def _send_json(self, status: int, body, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _text(self, seed: str, chars: int) -> str:
+        rng = random.Random(seed)
+        paragraphs, size = [], 0
+        while size < chars:
+            sentence_count = rng.randint(3, 7)
+            paragraph = " ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+                for _ in range(sentence_count)
+            )
+            paragraphs.append(paragraph)
+            size += len(paragraph) + 2
+        return "\n\n".join(paragraphs)[:chars]
+
+    # --- providers ---
+
+    def _gemini_text(self, prompt: str) -> str:
+        if "step-by-step plan" in prompt:
+            match = re.search(r'User Query: "(.*)"', prompt)
+            query = match.group(1) if match else "research"
+            steps = [{"id": "step_1", "action": "search_google", "input": query}]
+            for i in range(self.config.scrapes_per_plan):
+                steps.append({"id": f"step_{i + 2}", "action": "scrape_url", "input": f"step_1.urls[{i}]"})
+            summarize_id = f"step_{len(steps) + 1}"
+            steps.append({"id": summarize_id, "action": "summarize", "input": [f"{step['id']}.content" for step in steps[1:]]})
+            steps.append({"id": f"step_{len(steps) + 1}", "action": "finish", "input": f"{summarize_id}.summary"})
+            return json.dumps({"steps": steps})
+        if "sub-queries" in prompt:
+            return json.dumps([f"sub query {i}" for i in range(3)])
+        return self._text(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), self.config.report_chars)
+
+    def _handle_gemini(self, path: str):
+        prompt = self._read_json()["contents"][0]["parts"][0]["text"]
+        self._sleep("gemini")
+        if self._maybe_fail():
+            return
+        text = self._gemini_text(prompt)
+        # Rough token counts, enough to exercise the usage accounting
+        usage = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}
+        if ":streamGenerateContent" not in path:
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}]}}], "usageMetadata": usage})
+            return
+
+        # Server-sent events, one chunk of the text per event
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = self.config.stream_chunk_chars
+        for start in range(0, len(text), step):
+            event = {"candidates": [{"content": {"parts": [{"text": text[start:start + step]}]}}], "usageMetadata": usage}
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def _handle_search(self, query: dict):
+        self._sleep("serpapi")
+        if self._maybe_fail():
+            return
+        q = query.get("q", [""])[0]
+        digest = hashlib.sha256(q.encode("utf-8")).hexdigest()[:12]
+        results = [
+            {"position": i + 1, "title": f"Result {i + 1} for {q}", "link": f"https://example.test/{digest}/{i}"}
+            for i in range(self.config.results_per_search)
+        ]
+        self._send_json(200, {"organic_results": results})
+
+    def _handle_scrape(self):
+        url = self._read_json().get("url", "")
+        self._sleep("firecrawl")
+        if self._maybe_fail():
+            return
+        markdown = f"# {url}\n\n" + self._text(url, self.config.page_kb * 1024)
+        self._send_json(200, {"success": True, "data": {"markdown": markdown, "metadata": {"sourceURL": url}}})
+
+    # --- routing ---
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.endswith("/search"):
+            self._handle_search(parse_qs(parts.query))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        if "/models/" in parts.path:
+            self._handle_gemini(parts.path)
+        elif parts.path.endswith("/scrape"):
+            self._handle_scrape()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+def start_fake_server(config: FakeServerConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """
+    Starts the fake server on a background thread and returns (server, env),
+    where `env` holds the environment variables that point the agent at it.
+    """
+    handler = type("ConfiguredFakeProviderHandler", (FakeProviderHandler,), {
+        "config": config or FakeServerConfig(),
+        "rng": random.Random((config or FakeServerConfig()).seed),
+        "rng_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://{host}:{server.server_address[1]}"
+    env = {
+        "GEMINI_API_BASE": f"{base}/v1beta",
+        "SERPAPI_URL": f"{base}/search",
+        "FIRECRAWL_API_URL": f"{base}/v0/scrape",
+    }
+    return server, env
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    """Adds the fake server options to a command-line parser."""
+    defaults = FakeServerConfig()
+    parser.add_argument("--gemini-latency-ms", type=float, default=defaults.latency_ms["gemini"])
+    parser.add_argument("--serpapi-latency-ms", type=float, default=defaults.latency_ms["serpapi"])
+    parser.add_argument("--firecrawl-latency-ms", type=float, default=defaults.latency_ms["firecrawl"])
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="Log-normal spread of latencies.")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of calls failing with 429/500.")
+    parser.add_argument("--page-kb", type=int, default=defaults.page_kb, help="Size of each scraped page.")
+    parser.add_argument("--scrapes-per-plan", type=int, default=defaults.scrapes_per_plan)
+    parser.add_argument("--seed", type=int, default=None)
+
+def config_from_args(args) -> FakeServerConfig:
+    return FakeServerConfig(
+        latency_ms={"gemini": args.gemini_latency_ms, "serpapi": args.serpapi_latency_ms, "firecrawl": args.firecrawl_latency_ms},
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        page_kb=args.page_kb,
+        scrapes_per_plan=args.scrapes_per_plan,
+        seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in server for Gemini, SerpApi and Firecrawl.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server, env = start_fake_server(config_from_args(args), args.host, args.port)
+    print("Fake provider server running. Point the agent at it with:")
+    for key, value in env.items():
+        print(f"  {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+End-to-end benchmark of the research graph against the local fake providers.
+
+Runs two scenarios through `run_research_agent` without spending API credits:
+  - single: queries run one after another
+  - batch:  queries run concurrently through the batch runner
+
+and reports p50/p95/p99 latency, runs per second and peak RSS.
+
+Usage:
+    python benchmarks/run_benchmark.py [--queries 20] [--concurrency 8]
+        [--json out.json] [--baseline base.json] [fake server options]
+
+Caches are disabled by default so every run pays the (simulated) provider
+latency; pass --with-caches to measure warm behaviour instead.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import tempfile
+import contextlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_server import start_fake_server, add_config_arguments, config_from_args
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize_latencies(name: str, records: list, wall_time: float) -> dict:
+    from batch import percentile
+    latencies = [record["latency_s"] for record in records]
+    return {
+        "scenario": name,
+        "runs": len(records),
+        "failed": sum(1 for record in records if record["status"] != "ok"),
+        "wall_s": wall_time,
+        "runs_per_s": len(records) / wall_time if wall_time else 0.0,
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def configure_environment(provider_env: dict, with_caches: bool):
+    """Points the agent at the fake server. Must run before `main` is imported."""
+    os.environ.update(provider_env)
+    for name in ("GEMINI_API_KEY", "SERPER_API_KEY", "FIRECRAWL_API_KEY"):
+        os.environ.setdefault(name, "benchmark")
+    if not with_caches:
+        for name in ("SCRAPE_CACHE_ENABLED", "SEARCH_CACHE_ENABLED", "PLAN_CACHE_ENABLED"):
+            os.environ[name] = "false"
+    # The fake server is not rate limited, so provider quotas should not shape the numbers
+    for provider in ("GEMINI", "SERPAPI", "FIRECRAWL"):
+        os.environ.setdefault(f"{provider}_RATE_PER_SEC", "1000")
+        os.environ.setdefault(f"{provider}_BURST", "1000")
+        os.environ.setdefault(f"{provider}_CONCURRENCY", "64")
+        os.environ.setdefault(f"{provider}_MAX_CONCURRENCY", "256")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the research agent.")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent queries in the batch scenario.")
+    parser.add_argument("--scenarios", type=str, default="single,batch", help="Comma-separated scenarios to run.")
+    parser.add_argument("--with-caches", action="store_true", help="Keep the scrape, search and plan caches enabled.")
+    parser.add_argument("--json", type=str, help="Write the results to this file.")
+    parser.add_argument("--baseline", type=str, help="Compare against results from a previous --json run.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression versus the baseline (0.2 = 20%%).")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    # Resolve output paths before switching to the scratch directory
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    server, provider_env = start_fake_server(config_from_args(args))
+    configure_environment(provider_env, args.with_caches)
+
+    # Run in a scratch directory so result files and caches never land in the repo
+    workdir = tempfile.mkdtemp(prefix="research-bench-")
+    os.chdir(workdir)
+
+    from batch import run_query, run_batch
+
+    results = []
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        run_query("warmup", "benchmark warmup query")
+        scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        if "single" in scenarios:
+            start = time.perf_counter()
+            records = [run_query(str(i), f"single benchmark query {i}") for i in range(args.queries)]
+            results.append(summarize_latencies("single", records, time.perf_counter() - start))
+        if "batch" in scenarios:
+            queries = [(str(i), f"batch benchmark query {i}") for i in range(args.queries)]
+            start = time.perf_counter()
+            records = list(run_batch(queries, args.concurrency))
+            results.append(summarize_latencies(f"batch(c={args.concurrency})", records, time.perf_counter() - start))
+    server.shutdown()
+
+    print(f"{'scenario':<14} {'runs':>5} {'fail':>5} {'runs/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'RSS MB':>8}")
+    for result in results:
+        print(
+            f"{result['scenario']:<14} {result['runs']:>5} {result['failed']:>5} {result['runs_per_s']:>8.2f} "
+            f"{result['p50_s']:>8.2f} {result['p95_s']:>8.2f} {result['p99_s']:>8.2f} {result['peak_rss_mb']:>8.1f}"
+        )
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)}
+        regressions = []
+        for result in results:
+            previous = baseline.get(result["scenario"])
+            if not previous:
+                continue
+            for key in ("p50_s", "p95_s", "p99_s", "peak_rss_mb"):
+                if result[key] > previous[key] * (1 + args.tolerance):
+                    regressions.append(f"{result['scenario']} {key}: {previous[key]:.2f} -> {result[key]:.2f}")
+            if result["runs_per_s"] < previous["runs_per_s"] * (1 - args.tolerance):
+                regressions.append(f"{result['scenario']} runs_per_s: {previous['runs_per_s']:.2f} -> {result['runs_per_s']:.2f}")
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
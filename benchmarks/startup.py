@@ -0,0 +1,102 @@
+"""
+Startup benchmark for the research agent.
+
+Measures, each in a fresh interpreter so nothing is warm:
+  - import_s:       time to `import main`
+  - graph_build_s:  time for the first `get_graph()` (LangGraph import + compile)
+  - graph_cached_s: time for a second `get_graph()` call (should be ~0)
+  - first_query_s:  framework overhead of a first `run_research_agent` call, with
+                    planning answered locally so no external API is called
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--json out.json] [--baseline base.json]
+
+With --baseline, metrics more than --tolerance slower than the baseline are
+reported and the script exits with status 1.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import os, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.get_graph()
+built = time.perf_counter()
+main.get_graph()
+cached = time.perf_counter()
+
+# Answer planning locally with an empty plan so the run exercises the whole
+# graph without calling Gemini, SerpApi or Firecrawl
+import graph.planning_node
+graph.planning_node.generate_research_plan = lambda query: "{}"
+graph.planning_node.generate_sub_queries = lambda query: []
+for name in ("GEMINI_API_KEY", "SERPER_API_KEY", "FIRECRAWL_API_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+import contextlib, io
+query_start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    for event in main.run_research_agent("startup benchmark", use_plan_cache=False, stream=False):
+        pass
+query_end = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - start,
+    "graph_build_s": built - imported,
+    "graph_cached_s": cached - built,
+    "first_query_s": query_end - query_start,
+}))
+"""
+
+def run_probe() -> dict:
+    """Runs the probe in a fresh interpreter inside a scratch directory."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=workdir, env=env,
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and first-query overhead.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to sample.")
+    parser.add_argument("--json", type=str, help="Write the median metrics to this file.")
+    parser.add_argument("--baseline", type=str, help="Compare against metrics from a previous --json run.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown versus the baseline (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    medians = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+    print(f"Startup benchmark ({args.runs} runs, median)")
+    for key, value in medians.items():
+        print(f"  {key:<16} {value * 1000:9.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(medians, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = [
+            key for key, value in medians.items()
+            if key in baseline and value > baseline[key] * (1 + args.tolerance) and value - baseline[key] > 0.005
+        ]
+        for key in regressions:
+            print(f"REGRESSION: {key} {baseline[key] * 1000:.1f} ms -> {medians[key] * 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
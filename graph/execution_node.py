@@ -1,92 +1,303 @@
+import threading
 from utils.serp_api import search_web
-from utils.firecrawl_api import scrape_url
-from utils.gemini_api import call_gemini
-from utils.helpers import get_value_from_path
+from utils.search_fanout import fan_out_search
+from utils.firecrawl_api import scrape_url, revalidate_scrape
+from utils.summarizer import summarize_content
+from utils.retrieval import select_relevant_content
+from utils.dedup import dedupe_sources
+from utils.markdown_compact import compact_markdown
+from utils.scrape_cache import normalize_url
+from utils.helpers import get_value_from_path, compile_path
+from utils.blob_store import spill_result, resolve, is_blob_handle, content_hash
+from utils import tracing, prefetch
+from utils.checkpoints import save_checkpoint
+from graph.scheduler import get_ready_steps, run_steps, run_steps_until, step_references, drop_failed_steps, SCRAPE_QUORUM, SCRAPE_DEADLINE
+from langgraph.config import get_stream_writer
 
-def execute_node(state):
-    """Executes the current step in the research plan."""
-    plan = state.get("plan", [])
-    step_index = state.get("current_step_index", 0)
-    step_results = state.get("step_results", {})
-
-    if step_index >= len(plan):
-        return {"final_answer": step_results.get("step_" + str(len(plan)), {}).get("summary", "Research complete.")}
-
-    current_step = plan[step_index]
-    action = current_step["action"]
-    step_input_ref = current_step["input"]
-    step_id = current_step["id"]
+def resolve_step_input(step, step_results):
+    """Resolves a step's input references against the results of previous steps."""
+    step_input_ref = step["input"]
 
-    # Resolve input from previous steps
-    resolved_input = None
     if isinstance(step_input_ref, list):
         # Handle multiple inputs by resolving each, filtering failures, and joining them
         resolved_parts = []
         for ref in step_input_ref:
             part = get_value_from_path(step_results, ref)
-            # Only include content that is not None and not a scrape failure message
-            if part and isinstance(part, str) and not part.startswith("SCRAPE_FAILED:"):
+            # Only include content that is not None, not a scrape failure message and not already included
+            if part and isinstance(part, str) and not part.startswith("SCRAPE_FAILED:") and part not in resolved_parts:
                 resolved_parts.append(part)
-        resolved_input = "\n\n---\n\n".join(resolved_parts)
+        return "\n\n---\n\n".join(resolved_parts)
     elif isinstance(step_input_ref, str) and step_input_ref.startswith("step_"):
         # Handle single input reference
-        resolved_input = get_value_from_path(step_results, step_input_ref)
-    else:
-        # Handle literal input
-        resolved_input = step_input_ref
+        return get_value_from_path(step_results, step_input_ref)
+    # Handle literal input
+    return step_input_ref
 
-    if resolved_input is None and action not in ["search_google"]: # search_google can have literal input
-        print(f"Info: Could not resolve input for step '{step_input_ref}'. This can happen if a search returns fewer results than planned. Skipping step.")
-        step_results[step_id] = {"content": f"SKIPPED: Could not resolve input {step_input_ref}"}
-        return {"current_step_index": step_index + 1, "step_results": step_results}
+def run_step(step, resolved_input, state, on_token=None, refresh=None):
+    """
+    Runs a single plan step and returns its entry for `step_results`. The
+    summarize step streams its report to `on_token` when it is given. In a
+    refresh (`refresh` holds the previous run's `source_hashes`), scrapes
+    revalidate cached pages and record whether the content `changed`.
+    """
+    action = step["action"]
 
-    result = None
     if action == "search_google":
-        result = search_web(resolved_input or state['original_query'])
-        step_results[step_id] = {"urls": result}
+        query = resolved_input or state['original_query']
+        prefetched = prefetch.take_search(state.get("run_id"), query)
+        if "sub_queries" in step:
+            # A fan-out search: the query and its sub-queries are searched at once and their rankings fused
+            return {"urls": fan_out_search(query, step["sub_queries"], step.get("top_n"), ranking=prefetched or None)}
+        return {"urls": prefetched or search_web(query)}
     elif action == "scrape_url":
         if isinstance(resolved_input, str):
-            scraped_data = scrape_url(resolved_input)
-            if scraped_data and scraped_data.get('markdown'):
-                result = scraped_data['markdown']
-                step_results[step_id] = {"content": result}
+            if refresh is not None:
+                scraped_data = revalidate_scrape(resolved_input)
             else:
-                error_message = f"Failed to scrape or get content from URL: {resolved_input}"
-                print(f"ERROR: {error_message}")
-                step_results[step_id] = {"content": f"SCRAPE_FAILED: {error_message}"}
-                result = None
-        else:
-            print(f"Warning: Scrape URL expects a single URL string, but got {type(resolved_input)}. Skipping.")
-            result = None
+                scraped_data = prefetch.take_scrape(state.get("run_id"), resolved_input) or scrape_url(resolved_input)
+            if scraped_data and scraped_data.get('markdown'):
+                # Images, menus, boilerplate and long URLs are stripped before the page enters state
+                result = compact_markdown(scraped_data['markdown'], resolved_input)
+                if refresh is not None:
+                    previous_hash = refresh["source_hashes"].get(normalize_url(resolved_input))
+                    result["changed"] = content_hash(result["content"]) != previous_hash
+                return result
+            error_message = f"Failed to scrape or get content from URL: {resolved_input}"
+            print(f"ERROR: {error_message}")
+            return {"content": f"SCRAPE_FAILED: {error_message}"}
+        print(f"Warning: Scrape URL expects a single URL string, but got {type(resolved_input)}. Skipping.")
+        return {"content": f"SKIPPED: Scrape URL expects a single URL string, got {type(resolved_input).__name__}"}
     elif action == "summarize":
         if not resolved_input or not resolved_input.strip():
             print("ERROR: Summarizer received no content to process. Skipping.")
-            result = "Error: Could not summarize because no content was found from previous steps."
-        else:
-            summarization_prompt = f"""You are a professional research analyst. Your task is to produce a comprehensive, detailed, and well-structured research report based on the provided text content. The report should be objective and synthesize information from all provided sources.
-
-**Instructions:**
-1.  **Do not invent information.** Base your entire report on the text provided below.
-2.  **Structure the report** with the following sections: Executive Summary, Key Findings (in bullet points), Detailed Analysis, and Conclusion.
-3.  **Write in a clear, professional tone.**
-4.  **Ensure the report is detailed and thorough.**
-
-**Provided Content to Synthesize:**
----
-{resolved_input}
----
-
-**Begin Research Report:**
-"""
-            summary = call_gemini(summarization_prompt)
-            result = summary
-        step_results[step_id] = {"summary": result}
+            return {"summary": "Error: Could not summarize because no content was found from previous steps."}
+        # Mirrors and syndicated copies would be summarized (and paid for) more than once
+        resolved_input = dedupe_sources(resolved_input)
+        # Keep only the passages relevant to the query and the planned searches
+        sub_queries = []
+        for plan_step in state.get("plan", []):
+            if plan_step.get("action") == "search_google" and isinstance(plan_step.get("input"), str):
+                sub_queries.append(plan_step["input"])
+                sub_queries.extend(plan_step.get("sub_queries", []))
+        relevant_content = select_relevant_content(resolved_input, state["original_query"], sub_queries)
+        # Token-budgeted map-reduce keeps each Gemini call within the chunk size
+        return {"summary": summarize_content(relevant_content, on_token=on_token)}
     elif action == "finish":
-        result = resolved_input
-        step_results[step_id] = {"summary": result}
-        return {"final_answer": result, "step_results": step_results}
+        return {"summary": resolved_input}
+
+    print(f"Warning: Unknown action '{action}' in step '{step['id']}'. Skipping.")
+    return {"content": f"SKIPPED: Unknown action {action}"}
+
+# Marks scrapes dropped by the quorum/deadline policy, so the output can tell them from failures
+LATE_MARKER = "Missed the scrape deadline:"
+
+def scrape_succeeded(result) -> bool:
+    """True when a (possibly spilled) scrape step result holds page content."""
+    content = (result or {}).get("content")
+    if is_blob_handle(content):
+        return True
+    return isinstance(content, str) and not content.startswith(("SCRAPE_FAILED:", "SKIPPED:"))
+
+def sources_unchanged(step, plan, step_results, source_hashes) -> bool:
+    """
+    True when a step only reads scrapes, and the pages it got are exactly the
+    previous run's sources with unchanged content.
+    """
+    steps_by_id = {plan_step["id"]: plan_step for plan_step in plan}
+    urls = set()
+    for ref in step_references(step):
+        source_step = steps_by_id.get(compile_path(ref).head)
+        if source_step is None or source_step.get("action") != "scrape_url":
+            return False
+        result = step_results.get(source_step["id"], {})
+        if not scrape_succeeded(result):
+            continue
+        if result.get("changed", True):
+            return False
+        urls.add(normalize_url(resolve_step_input(source_step, step_results)))
+    return bool(urls) and urls == set(source_hashes)
+
+def checkpoint_progress(state: dict):
+    """
+    Checkpoints a run's state. Failed steps (and what depends on them) are
+    left out, so a resume retries them.
+    """
+    step_results, completed_steps = drop_failed_steps(
+        state.get("plan", []), state.get("step_results", {}), state.get("completed_steps", [])
+    )
+    save_checkpoint({**state, "step_results": step_results, "completed_steps": completed_steps})
+
+def execute_node(state, config=None):
+    """
+    Executes every plan step whose dependencies are satisfied, running
+    independent steps (e.g. several scrapes of one search) concurrently.
+    With the `stream` option set, report tokens are emitted as `partial`
+    events on LangGraph's custom stream while the summary is generated.
+    The `scrape_quorum` and `scrape_deadline` options stop waiting for a
+    pass's scrapes once that many succeeded or that many seconds passed;
+    the stragglers are recorded as missing the deadline. With the `refresh`
+    option (the previous run's `source_hashes` and `final_answer`), pages are
+    revalidated rather than scraped, and a summary whose sources all came
+    back unchanged is taken from the previous run without calling Gemini.
+    The run is checkpointed as each step finishes, so a crash mid-pass only
+    loses the steps still in flight.
+    """
+    plan = state.get("plan", [])
+    step_results = state.get("step_results", {})
+    completed_steps = list(state.get("completed_steps", []))
+
+    if len(completed_steps) >= len(plan):
+        # Compiled plans may have dropped steps, so the last step's id need not be step_<len(plan)>
+        last_step_id = plan[-1]["id"] if plan else None
+        return {"final_answer": resolve(step_results.get(last_step_id, {}).get("summary", "Research complete."))}
+
+    ready_steps = get_ready_steps(plan, completed_steps)
+    if not ready_steps:
+        # The remaining steps wait on each other (a cycle in the plan), so none can ever run
+        pending = [step for step in plan if step["id"] not in completed_steps]
+        print(f"Info: Steps {[step['id'] for step in pending]} have unsatisfiable dependencies. Skipping them.")
+        for step in pending:
+            step_results[step["id"]] = {"content": f"SKIPPED: Could not resolve input {step['input']}"}
+            completed_steps.append(step["id"])
+        return {
+            "step_results": step_results,
+            "completed_steps": completed_steps,
+            "executed_steps": [step["id"] for step in pending],
+            "current_step_index": len(completed_steps)
+        }
+
+    # Resolve inputs up front so the workers never read shared state
+    runnable = []
+    for step in ready_steps:
+        resolved_input = resolve_step_input(step, step_results)
+        if resolved_input is None and step["action"] not in ["search_google"]: # search_google can have literal input
+            print(f"Info: Could not resolve input for step '{step['input']}'. This can happen if a search returns fewer results than planned. Skipping step.")
+            step_results[step["id"]] = {"content": f"SKIPPED: Could not resolve input {step['input']}"}
+        else:
+            runnable.append((step, resolved_input))
+
+    # A scrape of a page this run already scraped or is about to scrape (e.g. two
+    # searches returning the same result) reuses that result instead of calling Firecrawl again.
+    # A failed earlier scrape is not reused, so a later step gets to try the page itself
+    scraped_by_url = {}
+    for step in plan:
+        if step.get("action") == "scrape_url" and step["id"] in completed_steps and scrape_succeeded(step_results.get(step["id"])):
+            url = resolve_step_input(step, step_results)
+            if isinstance(url, str):
+                scraped_by_url.setdefault(normalize_url(url), step["id"])
+    merged_scrapes = []
+    unique_runnable = []
+    for step, resolved_input in runnable:
+        if step["action"] == "scrape_url" and isinstance(resolved_input, str):
+            url_key = normalize_url(resolved_input)
+            if url_key in scraped_by_url:
+                merged_scrapes.append((step["id"], scraped_by_url[url_key]))
+                continue
+            scraped_by_url[url_key] = step["id"]
+        unique_runnable.append((step, resolved_input))
+    if merged_scrapes:
+        tracing.count("scrapes.merged", len(merged_scrapes))
+        print(f"Info: Reusing earlier scrapes of the same pages for steps {[step_id for step_id, _ in merged_scrapes]}.")
+    runnable = unique_runnable
+
+    options = (config or {}).get("configurable", {})
+    refresh = options.get("refresh")
+    reused_summaries = []
+    if refresh and refresh.get("final_answer"):
+        reused_summaries = [
+            step["id"] for step, _ in runnable
+            if step["action"] == "summarize" and sources_unchanged(step, plan, step_results, refresh["source_hashes"])
+        ]
+        runnable = [(step, resolved_input) for step, resolved_input in runnable if step["id"] not in reused_summaries]
+
+    # Once every search has run, the pages the plan will scrape are known, so other prefetches can stop
+    run_id = state.get("run_id")
+    if all(step["id"] in completed_steps for step in plan if step.get("action") == "search_google"):
+        planned_urls = [
+            resolve_step_input(step, step_results) for step in plan
+            if step.get("action") == "scrape_url" and step["id"] not in completed_steps
+        ]
+        prefetch.retain(run_id, [url for url in planned_urls if isinstance(url, str)])
+
+    on_token = None
+    if options.get("stream"):
+        # The writer is bound to this node's context, so resolve it before handing off to workers
+        writer = get_stream_writer()
+        on_token = lambda text: writer({"type": "partial", "data": text})
+
+    # Large payloads are spilled to the blob store by the workers, so state only carries handles
+    abandoned = threading.Event()
+    finished = {}
+    checkpoint_lock = threading.Lock()
+
+    def run_traced(item):
+        step, resolved_input = item
+        with tracing.span(step["id"], "step", action=step["action"]):
+            result = run_step(step, resolved_input, state, on_token, refresh)
+            # A straggler finishing after the deadline must not add blob refs the run never releases
+            if abandoned.is_set():
+                return result
+            result = spill_result(run_id, result)
+        with checkpoint_lock:
+            if not abandoned.is_set():
+                finished[step["id"]] = result
+                checkpoint_progress({
+                    **state,
+                    "step_results": {**step_results, **finished},
+                    "completed_steps": completed_steps + list(finished),
+                })
+        return result
+
+    quorum = options.get("scrape_quorum")
+    deadline = options.get("scrape_deadline")
+    quorum = SCRAPE_QUORUM if quorum is None else quorum
+    deadline = SCRAPE_DEADLINE if deadline is None else deadline
+    scrape_count = sum(1 for step, _ in runnable if step["action"] == "scrape_url")
+
+    # Workers run on pool threads, which do not inherit the node's trace on their own
+    if scrape_count and (quorum > 0 or deadline > 0):
+        results = run_steps_until(
+            runnable,
+            tracing.bind(run_traced),
+            optional=lambda item: item[0]["action"] == "scrape_url",
+            succeeded=scrape_succeeded,
+            quorum=quorum,
+            deadline=deadline,
+        )
+        abandoned.set()
+        late = [step["id"] for (step, _), result in zip(runnable, results) if result is None]
+        if late:
+            tracing.count("scrapes.late", len(late))
+            print(f"Info: Continuing with {scrape_count - len(late)} of {scrape_count} scrapes; {late} missed the quorum or deadline.")
+        results = [
+            {"content": f"SCRAPE_FAILED: {LATE_MARKER} {resolved_input}"} if result is None else result
+            for (_, resolved_input), result in zip(runnable, results)
+        ]
+    else:
+        results = run_steps(runnable, tracing.bind(run_traced))
+
+    final_answer = None
+    for (step, _), result in zip(runnable, results):
+        step_results[step["id"]] = result
+        if step["action"] == "finish":
+            final_answer = resolve(result["summary"])
+    for step_id, source_step_id in merged_scrapes:
+        step_results[step_id] = dict(step_results[source_step_id])
+    for step_id in reused_summaries:
+        tracing.count("refresh.summaries_reused")
+        print(f"Info: No source of step '{step_id}' changed. Reusing the previous report.")
+        if on_token is not None:
+            on_token(refresh["final_answer"])
+        step_results[step_id] = spill_result(run_id, {"summary": refresh["final_answer"], "reused": True})
 
-    return {
+    executed_steps = [step["id"] for step in ready_steps]
+    completed_steps.extend(executed_steps)
+    update = {
         "step_results": step_results,
-        "current_step_index": step_index + 1
+        "completed_steps": completed_steps,
+        "executed_steps": executed_steps,
+        "current_step_index": len(completed_steps)
     }
+    if final_answer is not None:
+        update["final_answer"] = final_answer
+    return update
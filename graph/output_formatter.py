@@ -1,8 +1,18 @@
 import json
 from utils.helpers import get_value_from_path
+from utils.blob_store import release_run, content_hash
+from utils.scrape_cache import normalize_url
+from utils.result_store import save_result
+from utils.checkpoints import CHECKPOINTS_ENABLED
+from utils import tracing
+from graph.execution_node import LATE_MARKER
 
-def output_formatter_node(state):
-    """Formats the final answer and extracts metadata for the UI."""
+def output_formatter_node(state, config=None):
+    """
+    Formats the final answer and extracts metadata for the UI. The hash of
+    every source's content is stored with the result, so a later refresh of
+    the run can tell which pages changed.
+    """
     print("---Formatting Final Output---")
     original_query = state["original_query"]
     final_answer = state.get("final_answer", "No final answer could be generated.")
@@ -10,12 +20,18 @@ def output_formatter_node(state):
     step_results = state.get("step_results", {})
 
     # Extract Sub-Queries (search queries)
-    sub_queries = [
-        step["input"] for step in plan if step.get("action") == "search_google"
-    ]
+    sub_queries = []
+    for step in plan:
+        if step.get("action") == "search_google":
+            sub_queries.append(step["input"])
+            # A fan-out search also ran its sub-queries
+            sub_queries.extend(step.get("sub_queries", []))
 
-    # Extract Sources Used (successfully scraped URLs)
+    # Extract Sources Used (successfully scraped URLs), and those dropped by the scrape deadline
     sources_used = []
+    sources_late = []
+    source_hashes = {}
+    sources_changed = []
     for step in plan:
         if step.get("action") == "scrape_url":
             step_id = step["id"]
@@ -24,24 +40,49 @@ def output_formatter_node(state):
             if result and not str(result).startswith("SKIPPED:") and not str(result).startswith("SCRAPE_FAILED:"):
                 # Resolve the input path to get the URL
                 url = get_value_from_path(step_results, step["input"])
-                if url:
+                if url and url not in sources_used:
                     sources_used.append(url)
+                    source_hashes[normalize_url(url)] = content_hash(result)
+                    if step_results[step_id].get("changed"):
+                        sources_changed.append(url)
+            elif LATE_MARKER in str(result):
+                url = get_value_from_path(step_results, step["input"])
+                if url and url not in sources_late:
+                    sources_late.append(url)
 
     output_data = {
+        "run_id": state.get("run_id"),
         "original_query": original_query,
         "final_answer": final_answer,
         "sub_queries": sub_queries,
         "sources_used": sources_used,
+        "sources_late": sources_late,
+        "source_hashes": source_hashes,
         "plan_executed": plan
     }
 
+    refresh = (config or {}).get("configurable", {}).get("refresh")
+    if refresh:
+        output_data["refreshed_from"] = refresh["run_id"]
+        output_data["sources_changed"] = sources_changed
+
+    # Timings, call counts and token usage of the run so far (this node excluded)
+    trace_summary = tracing.summarize(state.get("run_id"))
+    if trace_summary:
+        output_data["trace_summary"] = trace_summary
+
     # Convert to JSON string
     output_json = json.dumps(output_data, indent=4)
 
-    # Save to file
-    with open("research_result.json", "w") as f:
-        f.write(output_json)
+    # Keyed by run id, so concurrent runs never overwrite each other's results. A run
+    # without an answer is stored too, but never re-served for the same query
+    answer = state.get("final_answer")
+    succeeded = isinstance(answer, str) and bool(answer.strip()) and not answer.startswith("Error:")
+    save_result(state.get("run_id"), original_query, output_json, succeeded)
+
+    # The run is over, so its spilled page contents and summaries can be freed. A run
+    # without an answer stays resumable from its checkpoint, which still needs them.
+    if state.get("final_answer") or not CHECKPOINTS_ENABLED:
+        release_run(state.get("run_id"))
 
-    print("Final result saved to research_result.json")
-    
     return {"final_output_json": output_json}
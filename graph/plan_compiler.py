@@ -0,0 +1,164 @@
+"""
+Compiles a validated plan into the form the execution node runs.
+
+The LLM plan often asks for the same work twice (an identical search, or two
+scrapes of the same result) and sometimes for work nothing uses. Each of those
+would be a wasted external call, so before execution starts the compiler:
+  - merges duplicate searches and duplicate scrapes, pointing references to
+    the merged steps at the one that is kept,
+  - drops steps the finish step does not (transitively) depend on,
+  - records every step's dependencies in `depends_on`, and parses each
+    reference path once into a cached accessor.
+
+Before that, the validation node can fold the plan's searches into one
+fan-out search (`fan_out_searches`), whose fused top results are scraped by
+one step each.
+
+The compiled plan is still a list of plain step dicts, so it can be cached,
+stored in graph state and exported with the result.
+"""
+from utils.helpers import compile_path
+from utils.search_cache import normalize_query
+from utils.search_fanout import unique_queries
+from utils.scrape_cache import normalize_url
+from graph.scheduler import step_references, step_dependencies
+
+def _rename_ref(ref, renames: dict):
+    if not isinstance(ref, str):
+        return ref
+    head = compile_path(ref).head
+    return renames[head] + ref[len(head):] if head in renames else ref
+
+def _rename_input(step_input, renames: dict):
+    """Points the references in a step input at the steps that replaced merged ones."""
+    if isinstance(step_input, list):
+        renamed = []
+        for ref in step_input:
+            ref = _rename_ref(ref, renames)
+            if ref not in renamed:
+                renamed.append(ref)
+        return renamed
+    return _rename_ref(step_input, renames)
+
+def _merge_key(step):
+    """Identifies steps that would make the same external call, or None."""
+    step_input = step.get("input")
+    if not isinstance(step_input, str):
+        return None
+    is_reference = step_input.startswith("step_")
+    if step.get("action") == "search_google" and not is_reference:
+        return ("search", normalize_query(step_input))
+    if step.get("action") == "scrape_url":
+        # References are compared after renaming, so two scrapes of the same result of merged searches match
+        return ("scrape", step_input if is_reference else normalize_url(step_input))
+    return None
+
+def merge_duplicate_steps(plan: list):
+    """Returns (plan, merged step ids), keeping the first of every group of duplicate steps."""
+    renames = {}
+    first_by_key = {}
+    merged = []
+    compiled = []
+    for step in plan:
+        step = {**step, "input": _rename_input(step.get("input"), renames)}
+        key = _merge_key(step)
+        if key is not None and key in first_by_key:
+            renames[step["id"]] = first_by_key[key]
+            merged.append(step["id"])
+            continue
+        if key is not None:
+            first_by_key[key] = step["id"]
+        compiled.append(step)
+    return compiled, merged
+
+def eliminate_dead_steps(plan: list):
+    """
+    Returns (plan, removed step ids) without the steps no `finish` step
+    depends on. A plan without a finish step is returned unchanged.
+    """
+    step_ids = {step["id"] for step in plan}
+    dependencies = {step["id"]: step_dependencies(step, step_ids) for step in plan}
+    stack = [step["id"] for step in plan if step.get("action") == "finish"]
+    if not stack:
+        return plan, []
+    live = set()
+    while stack:
+        step_id = stack.pop()
+        if step_id in live:
+            continue
+        live.add(step_id)
+        stack.extend(dependencies[step_id])
+    return [step for step in plan if step["id"] in live], [step["id"] for step in plan if step["id"] not in live]
+
+def next_step_number(plan: list) -> int:
+    """Returns the number after the highest `step_<n>` id of the plan."""
+    numbers = [int(step["id"][5:]) for step in plan if str(step.get("id", "")).startswith("step_") and step["id"][5:].isdigit()]
+    return max(numbers, default=0) + 1
+
+def fan_out_searches(plan: list, query: str, sub_queries: list, top_n: int):
+    """
+    Returns (plan, replaced step ids) with the plan's searches of literal
+    queries folded into one fan-out search of `query`, which also searches the
+    planned queries and `sub_queries`. Scrapes of the old searches' results
+    are replaced by one scrape per fused result, `top_n` in all. Existing step
+    ids are reused, so fanning out an already fanned-out plan changes nothing.
+    """
+    searches = [
+        step for step in plan
+        if step.get("action") == "search_google" and isinstance(step.get("input"), str) and not step["input"].startswith("step_")
+    ]
+    if not searches:
+        return plan, []
+    search_ids = {step["id"] for step in searches}
+    scrapes = [
+        step for step in plan
+        if step.get("action") == "scrape_url" and isinstance(step.get("input"), str)
+        and compile_path(step["input"]).head in search_ids
+    ]
+
+    planned_queries = []
+    for step in searches:
+        planned_queries.append(step["input"])
+        planned_queries.extend(step.get("sub_queries", []))
+    fan_out = {
+        "id": searches[0]["id"],
+        "action": "search_google",
+        "input": query,
+        "sub_queries": unique_queries([query] + planned_queries + list(sub_queries or []))[1:],
+        "top_n": top_n,
+    }
+    scrape_ids = [step["id"] for step in scrapes][:top_n]
+    next_number = next_step_number(plan)
+    while len(scrape_ids) < top_n:
+        scrape_ids.append(f"step_{next_number}")
+        next_number += 1
+    fan_out_scrapes = [
+        {"id": step_id, "action": "scrape_url", "input": f"{fan_out['id']}.urls[{index}]"}
+        for index, step_id in enumerate(scrape_ids)
+    ]
+
+    old_scrape_ids = {step["id"] for step in scrapes}
+    fanned = []
+    replaced = []
+    for step in plan:
+        if step["id"] == fan_out["id"]:
+            fanned.append(fan_out)
+            fanned.extend(fan_out_scrapes)
+        elif step["id"] in search_ids or step["id"] in old_scrape_ids:
+            if step["id"] not in scrape_ids:
+                replaced.append(step["id"])
+        else:
+            fanned.append(step)
+    return fanned, replaced
+
+def compile_plan(plan: list):
+    """Returns (compiled plan, report) for a validated plan."""
+    plan, merged = merge_duplicate_steps(plan)
+    plan, removed = eliminate_dead_steps(plan)
+    step_ids = {step["id"] for step in plan}
+    for step in plan:
+        step["depends_on"] = step_dependencies(step, step_ids)
+        # Parse every reference now so execution and output formatting only do lookups
+        for ref in step_references(step):
+            compile_path(ref)
+    return plan, {"merged_steps": merged, "removed_steps": removed}
@@ -1,9 +1,16 @@
 import json
+from utils.plan_cache import get_cache
+from utils.serp_api import SEARCH_TOP_N
+from utils.search_fanout import SEARCH_FANOUT_ENABLED
+from graph.plan_compiler import compile_plan, fan_out_searches, next_step_number
 
 def plan_validation_node(state):
     """
     Validates the plan generated by the LLM and corrects it if necessary.
-    Ensures the plan is logical and executable before the expensive execution phase.
+    Ensures the plan is logical and executable before the expensive execution phase,
+    then compiles it: duplicate steps are merged and unused steps dropped. With
+    search fan-out on, the planned searches and the generated sub-queries are
+    folded into one concurrent search first, and its top results are scraped.
     """
     print("---Validating and Correcting Plan---")
     plan = state.get("plan", [])
@@ -11,6 +18,11 @@ def plan_validation_node(state):
         print("Warning: Plan is empty. Cannot validate.")
         return {}
 
+    if SEARCH_FANOUT_ENABLED:
+        plan, replaced = fan_out_searches(plan, state["original_query"], state.get("sub_queries", []), SEARCH_TOP_N)
+        if replaced:
+            print(f"CORRECTION: Folded searches and scrapes {replaced} into one fan-out search of {SEARCH_TOP_N} results.")
+
     # Find all scrape steps and the summarize step
     scrape_step_ids = [step["id"] for step in plan if step.get("action") == "scrape_url"]
     summarize_step = next((step for step in plan if step.get("action") == "summarize"), None)
@@ -35,10 +47,21 @@ def plan_validation_node(state):
             finish_input = "Error: The research plan was flawed and could not produce a summary."
         
         plan.append({
-            "id": f"step_{len(plan) + 1}",
+            # The fan-out can leave gaps in the step numbers, so len(plan) may already be taken
+            "id": f"step_{next_step_number(plan)}",
             "action": "finish",
             "input": finish_input
         })
 
+    plan, report = compile_plan(plan)
+    if report["merged_steps"] or report["removed_steps"]:
+        print(f"COMPILATION: Merged duplicate steps {report['merged_steps']} and removed unused steps {report['removed_steps']}.")
+
     print(f"Validated Plan: {json.dumps(plan, indent=2)}")
+
+    # Only fresh LLM plans are cached, so a planning failure is never replayed
+    plan_cache = get_cache()
+    if plan_cache and state.get("plan_source") == "llm":
+        plan_cache.set(state["original_query"], plan)
+
     return {"plan": plan}
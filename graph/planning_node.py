@@ -1,23 +1,57 @@
 import json
-from utils.gemini_api import generate_research_plan
+from concurrent.futures import ThreadPoolExecutor
+from utils.gemini_api import generate_research_plan, generate_sub_queries
+from utils.plan_cache import get_cache
+from utils.search_fanout import SEARCH_FANOUT_ENABLED, SEARCH_SUB_QUERIES
+from utils import tracing, prefetch
 
-def planning_node(state):
-    """Generates a research plan based on the original query."""
+def planning_node(state, config=None):
+    """
+    Generates a research plan based on the original query. A validated plan
+    cached for the same or a near-duplicate query is reused unless the run
+    sets `use_plan_cache` to False in its configurable options. With the
+    `speculative` option, the query is searched and its top results scraped
+    while the plan is being generated. With search fan-out on, sub-queries
+    for it are generated by a second Gemini call running alongside the plan's.
+    """
     print("---Generating Research Plan---")
     original_query = state["original_query"]
-    
-    plan_json_str = generate_research_plan(original_query)
-    
-    try:
-        plan = json.loads(plan_json_str)
-        print(f"Generated Plan: {json.dumps(plan, indent=2)}")
+    options = (config or {}).get("configurable", {})
+
+    if options.get("speculative"):
+        prefetch.start(state.get("run_id"), original_query)
+
+    plan_cache = get_cache() if options.get("use_plan_cache", True) else None
+    cached_plan = plan_cache.get(original_query) if plan_cache else None
+    if plan_cache:
+        tracing.count("plan_cache.hit" if cached_plan else "plan_cache.miss")
+    if cached_plan:
+        print(f"Reusing cached plan: {json.dumps(cached_plan, indent=2)}")
         return {
-            "plan": plan.get("steps", []),
+            "plan": cached_plan,
+            "plan_source": "cache",
             "step_results": {},
+            "completed_steps": [],
             "current_step_index": 0
         }
-    except (json.JSONDecodeError, TypeError):
+
+    sub_queries_future = None
+    if SEARCH_FANOUT_ENABLED and SEARCH_SUB_QUERIES > 0:
+        # Not a `with` block: a run whose plan fails must not wait for its sub-queries
+        executor = ThreadPoolExecutor(max_workers=1)
+        sub_queries_future = executor.submit(tracing.bind(generate_sub_queries), original_query)
+        executor.shutdown(wait=False)
+
+    plan_json_str = generate_research_plan(original_query)
+
+    try:
+        plan = json.loads(plan_json_str)
+        steps = plan.get("steps", [])
+    except (json.JSONDecodeError, TypeError, AttributeError):
         print("Error: Failed to decode JSON plan from Gemini.")
+        if sub_queries_future is not None:
+            # The fallback plan is not fanned out; a call already in flight is left to finish unread
+            sub_queries_future.cancel()
         # Fallback to a simple, single-step plan
         return {
             "plan": [{
@@ -25,6 +59,25 @@ def planning_node(state):
                 "action": "search_google",
                 "input": original_query
             }],
+            "plan_source": "fallback",
+            "sub_queries": [],
             "step_results": {},
+            "completed_steps": [],
             "current_step_index": 0
         }
+
+    print(f"Generated Plan: {json.dumps(plan, indent=2)}")
+    sub_queries = []
+    if sub_queries_future is not None:
+        if steps:
+            sub_queries = sub_queries_future.result()[:SEARCH_SUB_QUERIES]
+        else:
+            sub_queries_future.cancel()
+    return {
+        "plan": steps,
+        "plan_source": "llm",
+        "sub_queries": sub_queries,
+        "step_results": {},
+        "completed_steps": [],
+        "current_step_index": 0
+    }
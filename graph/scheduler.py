@@ -0,0 +1,146 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.helpers import compile_path
+from utils.config import env_int, env_float
+
+MAX_PARALLEL_STEPS = env_int("MAX_PARALLEL_STEPS", 4)
+# Scrape fan-out policy: summarize once this many scrapes succeeded (0 = wait for all) ...
+SCRAPE_QUORUM = env_int("SCRAPE_QUORUM", 0)
+# ... or once this many seconds have passed since the scrapes started (0 = no deadline)
+SCRAPE_DEADLINE = env_float("SCRAPE_DEADLINE", 0)
+
+def step_references(step):
+    """Returns the list of reference strings found in a step's input."""
+    step_input = step.get("input")
+    if isinstance(step_input, list):
+        return [ref for ref in step_input if isinstance(ref, str)]
+    if isinstance(step_input, str):
+        return [step_input]
+    return []
+
+def step_dependencies(step, step_ids):
+    """Returns the ids of the steps in `step_ids` that a step's input refers to."""
+    deps = []
+    for ref in step_references(step):
+        # The step id is the first key of the path
+        head = compile_path(ref).head
+        if head in step_ids and head != step["id"] and head not in deps:
+            deps.append(head)
+    return deps
+
+def build_dependency_graph(plan):
+    """
+    Maps every step id to the ids of the plan steps its input refers to.
+    Compiled plans carry the edges in `depends_on`, so only other plans are parsed.
+    """
+    step_ids = {step["id"] for step in plan}
+    return {
+        step["id"]: step["depends_on"] if "depends_on" in step else step_dependencies(step, step_ids)
+        for step in plan
+    }
+
+def get_ready_steps(plan, completed_steps):
+    """Returns the pending steps whose dependencies have all completed, in plan order."""
+    graph = build_dependency_graph(plan)
+    done = set(completed_steps)
+    return [
+        step for step in plan
+        if step["id"] not in done and all(dep in done for dep in graph[step["id"]])
+    ]
+
+def run_steps(steps, run_step, max_workers=None):
+    """
+    Runs `run_step(step)` for every step concurrently and returns the results
+    in the same order as `steps`.
+    """
+    if not steps:
+        return []
+    if len(steps) == 1:
+        return [run_step(steps[0])]
+
+    workers = min(max_workers or MAX_PARALLEL_STEPS, len(steps))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        return list(executor.map(run_step, steps))
+
+def run_steps_until(steps, run_step, optional, succeeded, quorum=0, deadline=None, max_workers=None):
+    """
+    Like `run_steps`, but stops waiting for the `optional` steps once `quorum`
+    of them have `succeeded` (0 = all of them) or `deadline` seconds have
+    passed. Other steps are always waited for. Returns the results in the
+    order of `steps`, with None for every abandoned step; abandoned steps that
+    already started keep running in the background and their results are dropped.
+    """
+    if not steps:
+        return []
+
+    workers = min(max_workers or MAX_PARALLEL_STEPS, len(steps))
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+    futures = [executor.submit(run_step, step) for step in steps]
+    required = {future for future, step in zip(futures, steps) if not optional(step)}
+    optional_count = len(futures) - len(required)
+    if quorum <= 0 or quorum > optional_count:
+        quorum = optional_count
+    expires_at = time.monotonic() + deadline if deadline else None
+
+    pending = set(futures)
+    successes = 0
+    try:
+        while pending:
+            out_of_time = expires_at is not None and time.monotonic() >= expires_at
+            if successes >= quorum or out_of_time:
+                # Only the required steps are still worth waiting for
+                waiting_for = pending & required
+                if not waiting_for:
+                    break
+                timeout = None
+            else:
+                waiting_for = pending
+                timeout = None if expires_at is None else max(0.0, expires_at - time.monotonic())
+            done, _ = wait(waiting_for, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                if future not in required and future.exception() is None and succeeded(future.result()):
+                    successes += 1
+    finally:
+        # Queued stragglers never start; running ones cannot be interrupted
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [None if future in pending else future.result() for future in futures]
+
+def step_failed(step, result) -> bool:
+    """True when a step's result records a failure or skip rather than usable output."""
+    if not isinstance(result, dict):
+        return True
+    action = step.get("action")
+    if action == "search_google":
+        return not result.get("urls")
+    if action in ("summarize", "finish"):
+        summary = result.get("summary")
+        return summary is None or (isinstance(summary, str) and summary.startswith("Error:"))
+    content = result.get("content")
+    return isinstance(content, str) and content.startswith(("SCRAPE_FAILED:", "SKIPPED:"))
+
+def drop_failed_steps(plan, step_results, completed_steps):
+    """
+    Returns (step_results, completed_steps) without the failed steps and every
+    step that depends on one, so that resuming runs them again.
+    """
+    graph = build_dependency_graph(plan)
+    dependents = {step_id: [] for step_id in graph}
+    for step_id, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(step_id)
+
+    steps = {step["id"]: step for step in plan}
+    stack = [
+        step_id for step_id in completed_steps
+        if step_id in steps and step_failed(steps[step_id], step_results.get(step_id))
+    ]
+    dropped = set()
+    while stack:
+        step_id = stack.pop()
+        if step_id in dropped:
+            continue
+        dropped.add(step_id)
+        stack.extend(dependents.get(step_id, []))
+    kept_results = {step_id: result for step_id, result in step_results.items() if step_id not in dropped}
+    return kept_results, [step_id for step_id in completed_steps if step_id not in dropped]
@@ -0,0 +1,248 @@
+"""
+A local job runner for research runs started from the Streamlit app.
+
+Runs execute in a pool of worker processes, so a long run never holds a
+Streamlit script thread, and several runs use several cores. Every event a
+run yields is appended to a SQLite job store, which is the channel between
+the workers and the app: the app polls a job's events by job id. Jobs are
+keyed by id rather than by session, so a rerun or a browser refresh can pick
+a running job up again and a finished job's result stays retrievable.
+"""
+import uuid
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.sqlite_store import SQLiteStore, lazy_store
+from utils.config import env_str, env_int, env_float
+
+JOB_STORE_PATH = env_str("JOB_STORE_PATH", ".cache/jobs.sqlite3")
+# Research runs executing at once on this host; further jobs wait in the queue
+JOB_MAX_WORKERS = env_int("JOB_MAX_WORKERS", 2)
+# Seconds between polls of a job's events
+JOB_POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 0.2)
+# Report fragments are written to the store at most this often, as one event
+JOB_PARTIAL_FLUSH_INTERVAL = env_float("JOB_PARTIAL_FLUSH_INTERVAL", 0.25)
+# Jobs and their events are dropped this many seconds after they were created
+JOB_TTL = env_float("JOB_TTL", 7 * 24 * 3600)
+
+FINISHED_STATUSES = ("done", "error", "failed", "interrupted")
+
+class JobStore(SQLiteStore):
+    """
+    Jobs and their event logs in SQLite. Workers in other processes append
+    events while the app reads them, which WAL mode allows without blocking.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                status TEXT NOT NULL,
+                run_id TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )"""
+        )
+
+    def create(self, job_id: str, query: str):
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (job_id, query, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, query or "", now, now),
+        )
+
+    def update(self, job_id: str, **fields):
+        """Sets `status`, `run_id` and/or `error` of a job."""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? WHERE job_id = ?",
+            (*fields.values(), time.time(), job_id),
+        )
+
+    def append(self, job_id: str, seq: int, event: dict):
+        self._connect().execute(
+            "INSERT INTO events (job_id, seq, event) VALUES (?, ?, ?)", (job_id, seq, json.dumps(event))
+        )
+
+    def get(self, job_id: str):
+        """Returns a job's row as a dict, or None."""
+        row = self._connect().execute(
+            "SELECT job_id, query, status, run_id, error, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("job_id", "query", "status", "run_id", "error", "created_at", "updated_at"), row))
+
+    def events(self, job_id: str, after: int = 0) -> list:
+        """Returns (seq, event) pairs of a job with a sequence number above `after`, in order."""
+        rows = self._connect().execute(
+            "SELECT seq, event FROM events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    def interrupt_unfinished(self):
+        """Marks jobs left queued or running by a previous server process as interrupted."""
+        self._connect().execute(
+            "UPDATE jobs SET status = 'interrupted', updated_at = ? WHERE status IN ('queued', 'running')", (time.time(),)
+        )
+
+    def prune(self, max_age: float):
+        conn = self._connect()
+        cutoff = time.time() - max_age
+        conn.execute("DELETE FROM events WHERE job_id IN (SELECT job_id FROM jobs WHERE created_at < ?)", (cutoff,))
+        conn.execute("DELETE FROM jobs WHERE created_at < ?", (cutoff,))
+
+def _init_worker():
+    """Builds the research graph once per worker process, before its first job."""
+    from main import get_graph
+    get_graph()
+
+def _run_job(job_id: str, query: str, options: dict, store_path: str):
+    """
+    Runs one research job inside a worker process and appends its events to
+    the job store. Report fragments are merged into one `partial` event per
+    flush interval, so streaming does not cost a write per token.
+    """
+    from main import run_research_agent
+    store = JobStore(store_path)
+    store.update(job_id, status="running")
+    seq = 0
+    partial = ""
+    last_flush = time.monotonic()
+
+    def append(event):
+        nonlocal seq
+        seq += 1
+        store.append(job_id, seq, event)
+
+    def flush():
+        nonlocal partial, last_flush
+        if partial:
+            append({"type": "partial", "data": partial})
+            partial = ""
+        last_flush = time.monotonic()
+
+    status, error = "failed", "Research finished without a result."
+    try:
+        for event in run_research_agent(query, **options):
+            if event.get("type") == "partial":
+                partial += event["data"]
+                if time.monotonic() - last_flush >= JOB_PARTIAL_FLUSH_INTERVAL:
+                    flush()
+                continue
+            flush()
+            append(event)
+            if event.get("type") == "run":
+                store.update(job_id, run_id=event["data"])
+            elif event.get("type") == "result":
+                status, error = "done", None
+                break
+            elif event.get("type") == "error":
+                status, error = "error", event["data"]
+                break
+    except Exception as e:
+        flush()
+        error = f"{type(e).__name__}: {e}"
+    if status == "failed":
+        append({"type": "error", "data": error})
+    store.update(job_id, status=status, error=error)
+
+class JobRunner:
+    """
+    Queues research jobs onto a pool of `max_workers` processes. Workers are
+    started with `spawn`, so they never inherit the threads and sockets of
+    the Streamlit server.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self._lock = threading.Lock()
+        self.executor = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def submit(self, query: str, **options) -> str:
+        """Queues a run of `run_research_agent(query, **options)` and returns its job id."""
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, query)
+        with self._lock:
+            try:
+                future = self.executor.submit(_run_job, job_id, query, options, self.store.path)
+            except BrokenProcessPool:
+                # A worker that died takes the whole pool down with it, so start a new one
+                self.executor = self._start_pool()
+                future = self.executor.submit(_run_job, job_id, query, options, self.store.path)
+        future.add_done_callback(lambda done: self._record_crash(job_id, done))
+        return job_id
+
+    def _record_crash(self, job_id: str, future):
+        # _run_job handles its own errors, so an exception here means the worker process died
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            self.store.update(job_id, status="failed", error=f"{type(error).__name__}: {error}")
+
+    def follow(self, job_id: str, after: int = 0):
+        """
+        Yields (seq, event) for a job's events after `after`, polling until the
+        job has finished. Following a job again from 0 replays all its events.
+        """
+        while True:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            # The status is read first, so a finished job's events are all read below
+            for seq, event in self.store.events(job_id, after):
+                after = seq
+                yield seq, event
+                if event.get("type") in ("result", "error"):
+                    return
+            if job["status"] in FINISHED_STATUSES:
+                # The worker died, or the server restarted, before the job could record its outcome
+                yield after + 1, {"type": "error", "data": self._lost_job_message(job)}
+                return
+            time.sleep(JOB_POLL_INTERVAL)
+
+    @staticmethod
+    def _lost_job_message(job: dict) -> str:
+        message = job["error"] or f"The job was {job['status']}."
+        if job["run_id"]:
+            message += f" Continue it with: python main.py --resume {job['run_id']}"
+        return message
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def _start_runner() -> JobRunner:
+    store = JobStore(JOB_STORE_PATH)
+    # Workers of an earlier server process are gone, and so are the jobs they were running.
+    # The store is meant for one app server per host, which owns all unfinished jobs.
+    store.interrupt_unfinished()
+    store.prune(JOB_TTL)
+    return JobRunner(store, JOB_MAX_WORKERS)
+
+_get_runner = lazy_store(_start_runner)
+
+def get_runner() -> JobRunner:
+    """Returns the process-wide job runner, starting its worker pool on first use."""
+    return _get_runner()
@@ -1,25 +1,23 @@
-import os
 import json
+import uuid
 import argparse
-from dotenv import load_dotenv
-from langgraph.graph import StateGraph, END
+import threading
 from typing import TypedDict, List
 
-# Import node functions
-from graph.input_node import input_node
-from graph.planning_node import planning_node
-from graph.plan_validation_node import plan_validation_node
-from graph.execution_node import execute_node
-from graph.output_formatter import output_formatter_node
-
-# Load environment variables
-load_dotenv()
+# Loads the .env file once for the whole process
+from utils.config import env_str
+from utils import tracing
 
 # Define the state for the graph
 class ResearchState(TypedDict):
+    run_id: str
     original_query: str
     plan: List[dict]
+    plan_source: str
+    sub_queries: List[str]
     step_results: dict
+    completed_steps: List[str]
+    executed_steps: List[str]
     current_step_index: int
     final_answer: str
     final_output_json: str
@@ -27,29 +25,51 @@ class ResearchState(TypedDict):
 def should_continue(state: ResearchState) -> str:
     """Determines whether to continue the research loop or finish."""
     plan = state.get("plan", [])
-    step_index = state.get("current_step_index", 0)
-    if step_index >= len(plan):
+    completed_steps = state.get("completed_steps", [])
+    if len(completed_steps) >= len(plan):
         return "end"
     
-    # Check if the last executed step was a 'finish' action
+    # Check if a 'finish' action has already produced the answer
     if state.get("final_answer"):
         return "end"
         
     return "continue"
 
+def route_start(state: ResearchState) -> str:
+    """Sends a resumed run, which already has a plan, straight back to execution."""
+    return "resume" if state.get("plan") else "new"
+
 def build_graph():
-    """Builds the LangGraph workflow with planning and execution loop."""
+    """
+    Builds the LangGraph workflow with planning and execution loop. Each pass
+    of the execution node runs every plan step whose inputs are ready.
+    """
+    # LangGraph and the node modules (and their HTTP clients) are imported here rather than
+    # at module import, so importing main stays cheap until a graph is actually needed
+    from langgraph.graph import StateGraph, END
+    from graph.input_node import input_node
+    from graph.planning_node import planning_node
+    from graph.plan_validation_node import plan_validation_node
+    from graph.execution_node import execute_node
+    from graph.output_formatter import output_formatter_node
+
     workflow = StateGraph(ResearchState)
 
-    # Add nodes
-    workflow.add_node("input_node", input_node)
-    workflow.add_node("planning_node", planning_node)
-    workflow.add_node("plan_validation_node", plan_validation_node)
-    workflow.add_node("execution_node", execute_node)
-    workflow.add_node("output_formatter", output_formatter_node)
+    # Add nodes, each timed into its run's trace
+    workflow.add_node("input_node", tracing.traced_node("input_node", input_node))
+    workflow.add_node("planning_node", tracing.traced_node("planning_node", planning_node))
+    workflow.add_node("plan_validation_node", tracing.traced_node("plan_validation_node", plan_validation_node))
+    workflow.add_node("execution_node", tracing.traced_node("execution_node", execute_node))
+    workflow.add_node("output_formatter", tracing.traced_node("output_formatter", output_formatter_node))
 
     # Set entry point
-    workflow.set_entry_point("input_node")
+    workflow.set_conditional_entry_point(
+        route_start,
+        {
+            "new": "input_node",
+            "resume": "execution_node"
+        }
+    )
 
     # Add edges
     workflow.add_edge("input_node", "planning_node")
@@ -69,57 +89,216 @@ def build_graph():
 
     return workflow.compile()
 
-def run_research_agent(query: str):
-    """Runs the research agent for a given query and yields status updates."""
-    if not all([os.getenv("GEMINI_API_KEY"), os.getenv("SERPER_API_KEY"), os.getenv("FIRECRAWL_API_KEY")]):
+_compiled_graph = None
+_compiled_graph_lock = threading.Lock()
+
+def get_graph():
+    """Returns the process-wide compiled graph, building it on first use."""
+    global _compiled_graph
+    if _compiled_graph is None:
+        with _compiled_graph_lock:
+            if _compiled_graph is None:
+                _compiled_graph = build_graph()
+    return _compiled_graph
+
+def run_research_agent(query: str, use_plan_cache: bool = True, stream: bool = True, speculative: bool = None,
+                       scrape_quorum: int = None, scrape_deadline: float = None, reuse_within: float = None,
+                       resume: str = None, refresh: str = None):
+    """
+    Runs the research agent for a given query and yields status updates.
+    Pass `use_plan_cache=False` to always generate a fresh plan. With `stream`,
+    the report is also yielded incrementally as `partial` events holding the
+    newly generated text, before the final `result` event. With `speculative`
+    (default: PREFETCH_ENABLED), the query is searched and its top results
+    scraped while the plan is still being generated. `scrape_quorum` and
+    `scrape_deadline` (defaults: SCRAPE_QUORUM, SCRAPE_DEADLINE) let the
+    summary start once that many scrapes succeeded or that many seconds passed.
+    A stored answer to the same (normalized) query at most `reuse_within`
+    seconds old (default: RESULT_REUSE_TTL) is re-served without running the graph.
+
+    The first event is a `run` event carrying the run id. Progress is
+    checkpointed as each plan step finishes, so a run that failed or was
+    interrupted can be continued with `resume=<run id>` (the query is then
+    taken from the checkpoint); its completed searches and scrapes are not repeated.
+
+    `refresh=<run id>` re-runs a finished run's query with its executed plan
+    as a new run: the searches run again, but pages whose cached copy the
+    site confirms (or whose content hash matches) are not scraped again, and
+    when none of the sources changed the previous report is reused as is.
+    """
+    if not all([env_str("GEMINI_API_KEY"), env_str("SERPER_API_KEY"), env_str("FIRECRAWL_API_KEY")]):
         yield {"type": "error", "data": "API keys for Gemini, Serper, and Firecrawl must be set in the .env file."}
         return
 
-    app = build_graph()
-    initial_state = {"original_query": query}
+    # Imported here, like the graph nodes, to keep HTTP clients out of startup
+    from utils import prefetch, result_store, checkpoints
+    if resume:
+        initial_state = checkpoints.load_checkpoint(resume)
+        if initial_state is None:
+            stored = result_store.load_result(resume)
+            if stored:
+                yield {"type": "status", "data": f"✅ Run {resume} already finished."}
+                yield {"type": "result", "data": stored}
+            else:
+                yield {"type": "error", "data": f"No checkpoint found for run {resume}."}
+            return
+        run_id, query = resume, initial_state["original_query"]
+        yield {"type": "run", "data": run_id}
+        yield {"type": "status", "data": f"⏯️ Resuming after {len(initial_state.get('completed_steps', []))} completed steps..."}
+    elif refresh:
+        stored = result_store.load_result(refresh)
+        previous = json.loads(stored) if stored else {}
+        if not previous.get("plan_executed"):
+            yield {"type": "error", "data": f"No stored result with a plan found for run {refresh}."}
+            return
+        run_id, query = uuid.uuid4().hex, previous["original_query"]
+        initial_state = {"run_id": run_id, "original_query": query, "plan": previous["plan_executed"], "plan_source": "refresh"}
+        yield {"type": "run", "data": run_id}
+        yield {"type": "status", "data": f"🔄 Refreshing run {refresh}: revalidating {len(previous.get('sources_used', []))} sources..."}
+    else:
+        recent = result_store.find_recent_result(query, result_store.RESULT_REUSE_TTL if reuse_within is None else reuse_within)
+        if recent:
+            yield {"type": "status", "data": f"♻️ Reusing the answer from run {recent[0]}..."}
+            yield {"type": "result", "data": recent[1]}
+            return
+        run_id = uuid.uuid4().hex
+        initial_state = {"run_id": run_id, "original_query": query}
+        yield {"type": "run", "data": run_id}
+
+    app = get_graph()
+    if speculative is None:
+        speculative = prefetch.PREFETCH_ENABLED
+    options = {
+        "use_plan_cache": use_plan_cache,
+        "stream": stream,
+        "speculative": speculative,
+        "scrape_quorum": scrape_quorum,
+        "scrape_deadline": scrape_deadline,
+    }
+    if refresh:
+        options["refresh"] = {
+            "run_id": refresh,
+            "source_hashes": previous.get("source_hashes", {}),
+            "final_answer": previous.get("final_answer"),
+        }
+    tracing.start_trace(run_id)
+    try:
+        yield from _stream_events(app, initial_state, {"configurable": options})
+    finally:
+        # Cancel speculative work the run never consumed, also when it stopped early
+        prefetch.release(run_id)
+        tracing.finish_trace(run_id)
+
+def _stream_events(app, initial_state, config):
+    """
+    Translates the graph's update and custom stream into agent events, and
+    checkpoints the run's state after planning and every execution pass (the
+    execution node also checkpoints as each step finishes).
+    """
+    from utils.checkpoints import delete_checkpoint
+    from graph.execution_node import checkpoint_progress
+
+    state = dict(initial_state)
+    plan = state.get("plan", [])
 
-    for event in app.stream(initial_state):
+    for mode, event in app.stream(initial_state, config, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            # Report tokens written by the execution node while it summarizes
+            if event.get("type") == "partial":
+                yield event
+            continue
         for node_name, output in event.items():
+            output = output or {}
+            state.update(output)
+            if node_name in ("plan_validation_node", "execution_node"):
+                checkpoint_progress(state)
+            if node_name in ("planning_node", "plan_validation_node") and "plan" in output:
+                plan = output["plan"]
             if node_name == "planning_node":
                 yield {"type": "status", "data": "🤔 Generating research plan..."}
             elif node_name == "plan_validation_node":
                 yield {"type": "status", "data": "✅ Validating and correcting plan..."}
             elif node_name == "execution_node":
-                plan = output.get("plan", [])
-                step_index = output.get("current_step_index", 1) -1 # -1 because it's the index of the step just completed
-                if step_index < len(plan):
-                    action = plan[step_index].get('action', 'Unknown')
-                    yield {"type": "status", "data": f"⚙️ Executing: {action}..."}
+                # One status per step completed in this pass, in plan order
+                actions = {step["id"]: step.get("action", "Unknown") for step in plan}
+                for step_id in output.get("executed_steps", []):
+                    yield {"type": "status", "data": f"⚙️ Executing: {actions.get(step_id, 'Unknown')}..."}
             elif node_name == "output_formatter":
+                if state.get("final_answer"):
+                    delete_checkpoint(state["run_id"])
+                else:
+                    # No report came out (e.g. Gemini failed while summarizing), so keep the run resumable
+                    checkpoint_progress(state)
+                    yield {"type": "status", "data": f"⚠️ No report was produced. Run {state['run_id']} can be resumed."}
                 yield {"type": "result", "data": output.get('final_output_json')}
 
 def main():
     """Main function to run the research agent from the command line."""
     parser = argparse.ArgumentParser(description="Deep Research Agent")
-    parser.add_argument("query", type=str, help="The research query.")
+    parser.add_argument("query", type=str, nargs="?", help="The research query.")
+    parser.add_argument("--no-plan-cache", action="store_true", help="Always generate a fresh research plan.")
+    parser.add_argument("--no-stream", action="store_true", help="Do not print the report while it is being generated.")
+    parser.add_argument("--speculative", action="store_true", help="Search and scrape ahead of the plan to overlap planning with fetching.")
+    parser.add_argument("--quorum", type=int, help="Start summarizing once this many scrapes succeeded.")
+    parser.add_argument("--deadline", type=float, help="Start summarizing at most this many seconds after the scrapes started.")
+    parser.add_argument("--reuse", type=float, metavar="SECONDS", help="Re-serve a stored answer to the same query if it is at most this old.")
+    parser.add_argument("--show-run", type=str, metavar="RUN_ID", help="Print the stored result of a previous run and exit.")
+    parser.add_argument("--resume", type=str, metavar="RUN_ID", help="Continue a failed or interrupted run from its last checkpoint.")
+    parser.add_argument("--refresh", type=str, metavar="RUN_ID", help="Re-run a finished run's query, only re-fetching and re-summarizing what changed.")
+    parser.add_argument("--batch", type=str, metavar="FILE", help="Run every query in a JSONL file ('-' for stdin) and print one JSON result per line.")
+    parser.add_argument("--concurrency", type=int, help="Maximum queries running at once in batch mode.")
     args = parser.parse_args()
     query = args.query
 
-    if not query:
+    if args.show_run:
+        from utils.result_store import load_result
+        stored = load_result(args.show_run)
+        print(json.dumps(json.loads(stored), indent=4) if stored else f"No stored result for run {args.show_run}.")
+        return
+
+    if args.batch:
+        from batch import main_batch
+        main_batch(args.batch, args.concurrency)
+        return
+
+    if not query and not args.resume and not args.refresh:
         print("Error: Query cannot be empty.")
         return
 
     final_result = None
-    for event in run_research_agent(query):
-        if event.get("type") == "status":
-            print(event["data"])  # Print status to console
-        elif event.get("type") == "result":
-            final_result = event["data"]
-            break
-        elif event.get("type") == "error":
-            print(f"Error: {event['data']}")
-            break
+    streamed = False
+    run_id = None
+    try:
+        for event in run_research_agent(query, use_plan_cache=not args.no_plan_cache, stream=not args.no_stream, speculative=args.speculative or None,
+                                        scrape_quorum=args.quorum, scrape_deadline=args.deadline, reuse_within=args.reuse,
+                                        resume=args.resume, refresh=args.refresh):
+            if event.get("type") == "run":
+                run_id = event["data"]
+            elif event.get("type") == "status":
+                print(event["data"])  # Print status to console
+            elif event.get("type") == "partial":
+                if not streamed:
+                    print("\n--- Report (streaming) ---")
+                    streamed = True
+                print(event["data"], end="", flush=True)
+            elif event.get("type") == "result":
+                final_result = event["data"]
+                break
+            elif event.get("type") == "error":
+                print(f"Error: {event['data']}")
+                break
+    except Exception as e:
+        print(f"\nError: {type(e).__name__}: {e}")
 
+    if streamed:
+        print()
     if final_result:
         print("\n--- Research Complete ---")
         print(json.dumps(json.loads(final_result), indent=4))
     else:
         print("\nCould not complete research.")
+    if run_id and not final_result:
+        print(f"Continue this run without repeating finished steps: python main.py --resume {run_id}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,12 @@
+from batch import percentile
+
+def test_p50_of_an_even_count_is_the_lower_middle_value():
+    assert percentile([4.0, 1.0, 3.0, 2.0], 0.50) == 2.0
+    assert percentile([6.0, 5.0, 4.0, 3.0, 2.0, 1.0], 0.50) == 3.0
+
+def test_nearest_rank_percentiles():
+    values = [float(value) for value in range(1, 21)]
+    assert percentile(values, 0.50) == 10.0
+    assert percentile(values, 0.95) == 19.0
+    assert percentile(values, 0.99) == 20.0
+    assert percentile([5.0], 0.99) == 5.0
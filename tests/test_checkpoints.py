@@ -0,0 +1,39 @@
+import threading
+import pytest
+from graph import execution_node
+from utils import checkpoints
+from utils.checkpoints import CheckpointStore
+
+def test_steps_finished_before_a_crash_mid_pass_are_checkpointed(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(checkpoints, "get_store", lambda: store)
+    monkeypatch.setattr(execution_node, "spill_result", lambda run_id, result: result)
+    first_scrape_done = threading.Event()
+
+    def run_step(step, resolved_input, state, on_token=None, refresh=None):
+        if resolved_input == "https://example.com/a":
+            first_scrape_done.set()
+            return {"content": "Page A"}
+        first_scrape_done.wait(5)
+        raise RuntimeError("worker crashed")
+
+    monkeypatch.setattr(execution_node, "run_step", run_step)
+    plan = [
+        {"id": "step_1", "action": "search_google", "input": "query"},
+        {"id": "step_2", "action": "scrape_url", "input": "step_1.urls[0]"},
+        {"id": "step_3", "action": "scrape_url", "input": "step_1.urls[1]"},
+    ]
+    state = {
+        "run_id": "run_1",
+        "original_query": "query",
+        "plan": plan,
+        "step_results": {"step_1": {"urls": ["https://example.com/a", "https://example.com/b"]}},
+        "completed_steps": ["step_1"],
+    }
+
+    with pytest.raises(RuntimeError):
+        execution_node.execute_node(state, {"configurable": {"scrape_quorum": 0, "scrape_deadline": 0}})
+
+    saved = store.load("run_1")
+    assert saved["completed_steps"] == ["step_1", "step_2"]
+    assert saved["step_results"]["step_2"] == {"content": "Page A"}
@@ -0,0 +1,89 @@
+from utils.markdown_compact import iter_compacted
+
+def compact(markdown: str) -> list:
+    return list(iter_compacted(markdown))
+
+def test_words_containing_boilerplate_phrases_are_kept():
+    page = "\n\n".join([
+        "# Catalog integration guide",
+        "## Design in practice",
+        "The design input matters more than the tooling.",
+        "Use the login page to test the session.",
+    ])
+    assert compact(page) == [
+        "# Catalog integration guide", "",
+        "## Design in practice", "",
+        "The design input matters more than the tooling.", "",
+        "Use the login page to test the session.",
+    ]
+
+def test_navigation_and_footer_lines_are_dropped():
+    page = "\n".join([
+        "Intro paragraph.",
+        "[Sign in](/login) | [Sign up](/register)",
+        "Privacy Policy · Terms of Use",
+        "© 2024 Example Inc. All rights reserved.",
+        "We use cookies to improve your experience.",
+        "Back to top",
+    ])
+    assert compact(page) == ["Intro paragraph."]
+
+def test_repeated_list_items_and_headings_are_kept():
+    page = "\n".join([
+        "## Does it scale?",
+        "- Yes",
+        "## Is it free?",
+        "- Yes",
+        "## Is it free?",
+    ])
+    assert compact(page) == ["## Does it scale?", "- Yes", "## Is it free?", "- Yes", "## Is it free?"]
+
+def test_repeated_breadcrumbs_are_dropped():
+    page = "\n".join([
+        "Docs › Guides ›",
+        "First section.",
+        "Docs › Guides ›",
+        "Second section.",
+    ])
+    assert compact(page) == ["Docs › Guides ›", "First section.", "Second section."]
+
+def test_code_blocks_pass_through():
+    page = "```\nsign in\nsign in\n```"
+    assert compact(page) == ["```", "sign in", "sign in", "```"]
+
+def test_navigation_menus_are_dropped():
+    page = "\n".join([
+        "Intro paragraph.",
+        "",
+        "- [Home](/)",
+        "- [Pricing](/pricing)",
+        "",
+        "- [About us](/about)",
+        "",
+        "Body paragraph.",
+    ])
+    assert compact(page) == ["Intro paragraph.", "", "Body paragraph."]
+
+def test_short_link_runs_keep_their_blank_lines():
+    page = "\n".join([
+        "First paragraph.",
+        "",
+        "[Read the changelog](https://example.com/changelog)",
+        "",
+        "Second paragraph.",
+    ])
+    assert compact(page) == ["First paragraph.", "", "Read the changelog", "", "Second paragraph."]
+
+def test_reference_lists_are_kept():
+    page = "\n".join([
+        "## References",
+        "1. [Attention Is All You Need](https://arxiv.org/abs/1706.03762)",
+        "2. [Deep Residual Learning for Image Recognition](https://arxiv.org/abs/1512.03385)",
+        "3. [BERT](https://arxiv.org/abs/1810.04805)",
+    ])
+    assert compact(page) == [
+        "## References",
+        "1. Attention Is All You Need",
+        "2. Deep Residual Learning for Image Recognition",
+        "3. BERT",
+    ]
@@ -0,0 +1,50 @@
+from utils.plan_cache import PlanCache
+
+def make_cache() -> PlanCache:
+    return PlanCache(ttl=3600, max_entries=16, threshold=0.75)
+
+def rust_plan(edition: str) -> list:
+    return [
+        {
+            "id": "step_1",
+            "action": "search_google",
+            "input": f"Rust {edition} edition changes",
+            "sub_queries": [f"Rust {edition} edition migration guide", "Rust borrow checker"],
+            "top_n": 4,
+        },
+        {"id": "step_2", "action": "scrape_url", "input": "step_1.urls[0]"},
+        {"id": "step_3", "action": "summarize", "input": ["step_2.content"]},
+        {"id": "step_4", "action": "finish", "input": "step_3.summary"},
+    ]
+
+def test_near_hit_for_another_entity_searches_the_new_query():
+    cache = make_cache()
+    cache.set("Rust 2021 edition changes", rust_plan("2021"))
+
+    plan = cache.get("Rust 2024 edition changes")
+
+    assert plan == rust_plan("2024")
+    assert cache.stats()["near_hits"] == 1
+
+def test_near_hit_leaves_the_cached_plan_unchanged():
+    cache = make_cache()
+    cache.set("Rust 2021 edition changes", rust_plan("2021"))
+    cache.get("Rust 2024 edition changes")
+
+    assert cache.get("rust 2021 edition changes?") == rust_plan("2021")
+    assert cache.stats()["hits"] == 1
+
+def test_near_duplicate_with_an_added_word_is_a_miss():
+    cache = make_cache()
+    cache.set("what is new in the rust 2021 edition", rust_plan("2021"))
+
+    assert cache.get("what is new in the rust 2021 edition") is not None
+    assert cache.get("what is new in rust 2021 edition") is not None
+    assert cache.get("what is new in the rust 2021 edition macros") is None
+    assert cache.stats()["misses"] == 1
+
+def test_languages_that_differ_in_symbols_do_not_share_a_plan():
+    cache = make_cache()
+    cache.set("C++ vs Rust performance", rust_plan("2021"))
+
+    assert cache.get("C# vs Rust performance") is None
@@ -0,0 +1,21 @@
+from graph import plan_validation_node as validation
+from utils.serp_api import SEARCH_TOP_N
+
+def test_finish_step_gets_a_unique_id_after_fan_out(monkeypatch):
+    monkeypatch.setattr(validation, "SEARCH_FANOUT_ENABLED", True)
+    monkeypatch.setattr(validation, "get_cache", lambda: None)
+    scrape_count = SEARCH_TOP_N + 1
+    plan = [{"id": "step_1", "action": "search_google", "input": "rust async runtimes"}]
+    plan += [
+        {"id": f"step_{index + 2}", "action": "scrape_url", "input": f"step_1.urls[{index}]"}
+        for index in range(scrape_count)
+    ]
+    plan.append({"id": f"step_{scrape_count + 2}", "action": "summarize", "input": []})
+
+    validated = validation.plan_validation_node({"plan": plan, "original_query": "rust async runtimes"})["plan"]
+
+    ids = [step["id"] for step in validated]
+    assert len(ids) == len(set(ids))
+    assert validated[-1]["action"] == "finish"
+    assert [step["action"] for step in validated].count("scrape_url") == SEARCH_TOP_N
+    assert any(step["action"] == "search_google" for step in validated)
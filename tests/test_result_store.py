@@ -0,0 +1,28 @@
+import json
+import sqlite3
+from utils.result_store import ResultStore
+
+def result(answer) -> str:
+    return json.dumps({"final_answer": answer})
+
+def test_failed_runs_are_stored_but_never_reused(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    store.put("run_ok", "What is Rust?", result("Rust is a language."))
+    store.put("run_failed", "what is rust", result("No final answer could be generated."), succeeded=False)
+
+    assert store.latest("what is rust", max_age=3600) == ("run_ok", result("Rust is a language."))
+    assert store.get("run_failed") == result("No final answer could be generated.")
+
+def test_failed_runs_of_an_older_store_are_marked_on_open(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE results (run_id TEXT PRIMARY KEY, query TEXT NOT NULL, query_key TEXT NOT NULL, "
+        "created_at REAL NOT NULL, result TEXT NOT NULL)"
+    )
+    rows = [("run_ok", result("An answer."), 1.0), ("run_failed", result("No final answer could be generated."), 2.0)]
+    conn.executemany("INSERT INTO results VALUES (?, 'q', 'q', ?, ?)", [(run_id, created, value) for run_id, value, created in rows])
+    conn.commit()
+    conn.close()
+
+    assert ResultStore(path).latest("q") == ("run_ok", result("An answer."))
@@ -0,0 +1,11 @@
+from utils.search_cache import normalize_query, cache_key
+
+def test_trivial_differences_normalize_to_one_key():
+    assert normalize_query("  What is  Rust? ") == normalize_query("what is rust")
+    assert normalize_query("Rust, Go, and Zig!") == "rust go and zig"
+    assert normalize_query("(node.js)") == "node.js"
+
+def test_languages_that_differ_in_symbols_get_different_keys():
+    keys = {normalize_query(f"{language} vs Rust performance") for language in ("C++", "C#", "C")}
+    assert len(keys) == 3
+    assert len({cache_key(language, {}) for language in ("C++", "C#", "C")}) == 3
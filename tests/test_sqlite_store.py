@@ -0,0 +1,21 @@
+import threading
+from utils.sqlite_store import SQLiteStore, lazy_store
+
+def test_each_thread_gets_its_own_wal_connection(tmp_path):
+    store = SQLiteStore(str(tmp_path / "nested" / "store.sqlite3"))
+    connections = []
+    thread = threading.Thread(target=lambda: connections.append(store._connect()))
+    thread.start()
+    thread.join()
+
+    conn = store._connect()
+    assert conn is store._connect()
+    assert conn is not connections[0]
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_lazy_store_creates_the_store_once():
+    created = []
+    get_store = lazy_store(lambda: created.append(object()) or created[-1])
+
+    assert get_store() is get_store()
+    assert len(created) == 1
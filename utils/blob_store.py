@@ -0,0 +1,123 @@
+import os
+import hashlib
+import threading
+from utils.sqlite_store import SQLiteStore, lazy_store
+from utils.config import env_str, env_int, env_bool
+
+BLOB_STORE_ENABLED = env_bool("BLOB_STORE_ENABLED", True)
+BLOB_STORE_DIR = env_str("BLOB_STORE_DIR", ".cache/blobs")
+# Strings at least this many characters long are spilled to disk instead of kept in graph state
+BLOB_SPILL_THRESHOLD = env_int("BLOB_SPILL_THRESHOLD", 16 * 1024)
+
+BLOB_KEY = "$blob"
+
+class BlobStore(SQLiteStore):
+    """
+    A content-addressed spill directory for large step payloads. Each blob is a
+    file named by the SHA-256 of its text, and every run that stores it holds a
+    reference in a SQLite index. A blob is deleted once no run references it,
+    so identical pages scraped by concurrent runs are stored once.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(os.path.join(directory, "index.sqlite3"))
+        self.directory = directory
+        self._connect().execute(
+            """CREATE TABLE IF NOT EXISTS refs (
+                run_id TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (run_id, digest)
+            )"""
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, run_id: str, text: str) -> dict:
+        """Stores `text` for `run_id` and returns its handle."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        # Register the reference first so a concurrent release never deletes a file being written
+        self._connect().execute("INSERT OR IGNORE INTO refs (run_id, digest) VALUES (?, ?)", (run_id, digest))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return {BLOB_KEY: digest, "bytes": len(data)}
+
+    def get(self, handle: dict) -> str:
+        """Loads the text behind a handle, or None if the blob no longer exists."""
+        try:
+            with open(self._path(handle[BLOB_KEY]), "rb") as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def release_run(self, run_id: str):
+        """Drops every reference held by `run_id` and deletes blobs no other run references."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            digests = [row[0] for row in conn.execute("SELECT digest FROM refs WHERE run_id = ?", (run_id,))]
+            conn.execute("DELETE FROM refs WHERE run_id = ?", (run_id,))
+            orphans = [
+                digest for digest in digests
+                if conn.execute("SELECT 1 FROM refs WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None
+            ]
+            for digest in orphans:
+                try:
+                    os.remove(self._path(digest))
+                except FileNotFoundError:
+                    pass
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+_get_store = lazy_store(lambda: BlobStore(BLOB_STORE_DIR))
+
+def get_store() -> BlobStore:
+    """Returns the process-wide blob store, or None when spilling is disabled."""
+    return _get_store() if BLOB_STORE_ENABLED else None
+
+def is_blob_handle(value) -> bool:
+    return isinstance(value, dict) and BLOB_KEY in value
+
+def spill(run_id: str, value):
+    """Replaces a large string with a blob handle; any other value is returned unchanged."""
+    store = get_store()
+    if store is None or not run_id or not isinstance(value, str) or len(value) < BLOB_SPILL_THRESHOLD:
+        return value
+    return store.put(run_id, value)
+
+def spill_result(run_id: str, result: dict) -> dict:
+    """Spills the large string fields of a `step_results` entry."""
+    return {key: spill(run_id, value) for key, value in result.items()}
+
+def resolve(value):
+    """Loads the text behind a blob handle; any other value is returned unchanged."""
+    if not is_blob_handle(value):
+        return value
+    store = get_store()
+    return store.get(value) if store else None
+
+def content_hash(value):
+    """
+    Returns the SHA-256 of a (possibly spilled) string without loading a
+    spilled one, since blobs are named by that hash. Other values give None.
+    """
+    if is_blob_handle(value):
+        return value[BLOB_KEY]
+    if isinstance(value, str):
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+    return None
+
+def release_run(run_id: str):
+    """Frees the blobs held by a finished run."""
+    store = get_store()
+    if store is not None and run_id:
+        store.release_run(run_id)
@@ -0,0 +1,80 @@
+import json
+import time
+from utils.sqlite_store import SQLiteStore, lazy_store
+from utils.blob_store import release_run
+from utils.config import env_str, env_float, env_bool
+
+CHECKPOINTS_ENABLED = env_bool("CHECKPOINTS_ENABLED", True)
+CHECKPOINT_PATH = env_str("CHECKPOINT_PATH", ".cache/checkpoints.sqlite3")
+# Unfinished runs older than this are dropped, along with the blobs they hold
+CHECKPOINT_TTL = env_float("CHECKPOINT_TTL", 7 * 24 * 3600)
+
+# The state needed to continue a run; everything else is recomputed
+CHECKPOINT_KEYS = ("run_id", "original_query", "plan", "plan_source", "step_results", "completed_steps", "current_step_index")
+
+class CheckpointStore(SQLiteStore):
+    """
+    The latest checkpoint of every unfinished run, in SQLite, keyed by run id.
+    Large page contents and summaries are already spilled to the blob store,
+    so a checkpoint only holds the plan, step handles and small results.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._connect().execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                state TEXT NOT NULL
+            )"""
+        )
+
+    def save(self, state: dict):
+        data = {key: state[key] for key in CHECKPOINT_KEYS if key in state}
+        self._connect().execute(
+            "INSERT OR REPLACE INTO checkpoints (run_id, query, updated_at, state) VALUES (?, ?, ?, ?)",
+            (state["run_id"], state.get("original_query", ""), time.time(), json.dumps(data)),
+        )
+
+    def load(self, run_id: str):
+        row = self._connect().execute("SELECT state FROM checkpoints WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, run_id: str):
+        self._connect().execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+    def prune(self, max_age: float) -> list:
+        """Deletes checkpoints not updated for `max_age` seconds and returns their run ids."""
+        conn = self._connect()
+        cutoff = time.time() - max_age
+        run_ids = [row[0] for row in conn.execute("SELECT run_id FROM checkpoints WHERE updated_at < ?", (cutoff,))]
+        conn.execute("DELETE FROM checkpoints WHERE updated_at < ?", (cutoff,))
+        return run_ids
+
+def _open_store() -> CheckpointStore:
+    store = CheckpointStore(CHECKPOINT_PATH)
+    # Abandoned runs would otherwise keep their blobs forever
+    for run_id in store.prune(CHECKPOINT_TTL):
+        release_run(run_id)
+    return store
+
+_get_store = lazy_store(_open_store)
+
+def get_store() -> CheckpointStore:
+    """Returns the process-wide checkpoint store, or None when checkpoints are disabled."""
+    return _get_store() if CHECKPOINTS_ENABLED else None
+
+def save_checkpoint(state: dict):
+    store = get_store()
+    if store is not None and state.get("run_id") and state.get("plan"):
+        store.save(state)
+
+def load_checkpoint(run_id: str):
+    store = get_store()
+    return store.load(run_id) if store else None
+
+def delete_checkpoint(run_id: str):
+    store = get_store()
+    if store is not None:
+        store.delete(run_id)
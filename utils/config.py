@@ -0,0 +1,26 @@
+"""
+Process-wide configuration. The `.env` file is read once, on the first import
+of this module, and every other module reads its settings through the helpers
+below instead of calling `load_dotenv()` itself.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def env_str(name: str, default: str = None) -> str:
+    return os.getenv(name, default)
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,133 @@
+"""
+Near-duplicate elimination for scraped sources.
+
+Mirrors, syndicated copies and sibling pages of the same docs often repeat
+each other. Before the summarize prompt is built, every source and then every
+paragraph gets a 64-bit SimHash of its word shingles. A source or paragraph is
+dropped when its fingerprint is within the configured similarity of one
+already kept. Fingerprints are bucketed by bands, so each lookup only compares
+against the few candidates sharing a band. The pass is linear in the size of
+the content rather than quadratic in the number of paragraphs.
+"""
+import re
+import hashlib
+from collections import defaultdict
+from utils.retrieval import SOURCE_SEPARATOR
+from utils.tokens import count_tokens
+from utils.config import env_int, env_float, env_bool
+from utils import tracing
+
+DEDUP_ENABLED = env_bool("DEDUP_ENABLED", True)
+# Fraction of matching fingerprint bits above which two texts count as duplicates
+DEDUP_SIMILARITY = env_float("DEDUP_SIMILARITY", 0.95)
+# Paragraphs shorter than this many words are always kept; their fingerprints are too noisy
+DEDUP_MIN_WORDS = env_int("DEDUP_MIN_WORDS", 8)
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3
+# Bits per counter when the per-bit votes are summed inside one big integer
+LANE_BITS = 24
+# SPREAD[b] places bit i of byte b at the start of counter lane i
+SPREAD = [sum(1 << (i * LANE_BITS) for i in range(8) if b >> i & 1) for b in range(256)]
+
+def words(text: str) -> list:
+    return re.findall(r"\w+", text.lower())
+
+def simhash(text_words: list) -> int:
+    """Returns the 64-bit SimHash of the word shingles of a text."""
+    if len(text_words) < SHINGLE_WORDS:
+        shingles = {" ".join(text_words)}
+    else:
+        shingles = {" ".join(text_words[i:i + SHINGLE_WORDS]) for i in range(len(text_words) - SHINGLE_WORDS + 1)}
+    # Count, per bit, how many shingle hashes set it: all 64 counters live in one
+    # integer, so each shingle costs 8 additions instead of 64
+    counters = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for index, byte in enumerate(digest):
+            counters += SPREAD[byte] << (index * 8 * LANE_BITS)
+    total = len(shingles)
+    mask = (1 << LANE_BITS) - 1
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        # A bit is set when most shingles vote for it
+        if 2 * (counters >> (bit * LANE_BITS) & mask) > total:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+class FingerprintIndex:
+    """
+    Finds fingerprints within `max_distance` bits of each other. The bits are
+    split into `max_distance + 1` bands, so by the pigeonhole principle any
+    near-duplicate matches at least one band exactly. Only fingerprints that
+    share a band bucket are compared bit by bit.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_width = FINGERPRINT_BITS // self.bands
+        self.buckets = defaultdict(list)
+
+    def _keys(self, fingerprint: int):
+        mask = (1 << self.band_width) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self.band_width) & mask
+
+    def contains_near(self, fingerprint: int) -> bool:
+        for key in self._keys(fingerprint):
+            for candidate in self.buckets.get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, fingerprint: int):
+        for key in self._keys(fingerprint):
+            self.buckets[key].append(fingerprint)
+
+def max_distance_for(similarity: float) -> int:
+    return max(0, int((1 - similarity) * FINGERPRINT_BITS))
+
+def dedupe_sources(content: str, similarity: float = None, min_words: int = None) -> str:
+    """
+    Drops near-duplicate sources from the joined `content`, then near-duplicate
+    paragraphs across the remaining sources, keeping the first occurrence.
+    Returns the content with the same separators.
+    """
+    if not DEDUP_ENABLED or not content:
+        return content
+    max_distance = max_distance_for(DEDUP_SIMILARITY if similarity is None else similarity)
+    min_words = DEDUP_MIN_WORDS if min_words is None else min_words
+
+    documents = FingerprintIndex(max_distance)
+    paragraphs = FingerprintIndex(max_distance)
+    kept_sources = []
+    dropped_sources = dropped_paragraphs = 0
+    for source in content.split(SOURCE_SEPARATOR):
+        if not source.strip():
+            continue
+        fingerprint = simhash(words(source))
+        if documents.contains_near(fingerprint):
+            dropped_sources += 1
+            continue
+        documents.add(fingerprint)
+
+        kept_paragraphs = []
+        for paragraph in source.split("\n\n"):
+            paragraph_words = words(paragraph)
+            if len(paragraph_words) >= min_words:
+                paragraph_fingerprint = simhash(paragraph_words)
+                if paragraphs.contains_near(paragraph_fingerprint):
+                    dropped_paragraphs += 1
+                    continue
+                paragraphs.add(paragraph_fingerprint)
+            kept_paragraphs.append(paragraph)
+        if any(paragraph.strip() for paragraph in kept_paragraphs):
+            kept_sources.append("\n\n".join(kept_paragraphs))
+
+    deduped = SOURCE_SEPARATOR.join(kept_sources)
+    if dropped_sources or dropped_paragraphs:
+        saved_tokens = count_tokens(content) - count_tokens(deduped)
+        tracing.count("dedup.tokens_saved", saved_tokens)
+        print(f"Info: Dedup dropped {dropped_sources} duplicate sources and {dropped_paragraphs} duplicate paragraphs, saving {saved_tokens} tokens.")
+    return deduped
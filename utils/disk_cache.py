@@ -0,0 +1,102 @@
+import json
+import time
+import zlib
+import threading
+from utils.sqlite_store import SQLiteStore
+
+class DiskCache(SQLiteStore):
+    """
+    A persistent key/value cache stored in SQLite. Values are JSON-encoded and
+    zlib-compressed, every entry has its own TTL, and the least recently used
+    entries are evicted once the stored size exceeds `max_bytes`.
+
+    The file is safe to share between threads and between processes on the
+    same host (see SQLiteStore).
+    """
+
+    def __init__(self, path: str, max_bytes: int, default_ttl: float):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str):
+        """Returns the cached value for `key`, or None if it is missing or expired."""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires_at < ?", (key, now))
+            self._count(False)
+            return None
+
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return json.loads(zlib.decompress(value))
+
+    def set(self, key: str, value, ttl: float = None):
+        """Stores `value` under `key` and evicts old entries if the cache is over its size cap."""
+        blob = zlib.compress(json.dumps(value).encode("utf-8"))
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), expires_at, now),
+        )
+        self._evict()
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used ones until under `max_bytes`."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    total -= size
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for this process and the current size of the cache."""
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
@@ -1,14 +1,92 @@
-import os
+import time
 import requests
-from dotenv import load_dotenv
+from utils import http_client
+from utils.scrape_cache import get_cached_scrape, get_scrape_entry, store_scrape
+from utils.hedging import hedged_call
+from utils import tracing
+from utils.config import env_str, env_float
 
-load_dotenv()
+FIRECRAWL_API_KEY = env_str("FIRECRAWL_API_KEY")
+FIRECRAWL_API_URL = env_str("FIRECRAWL_API_URL", "https://api.firecrawl.dev/v0/scrape")
+# Send one backup scrape when the first has not answered after this many seconds (0 = never)
+FIRECRAWL_HEDGE_AFTER = env_float("FIRECRAWL_HEDGE_AFTER", 0)
 
-FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
-FIRECRAWL_API_URL = "https://api.firecrawl.dev/v0/scrape"
+def scrape_url(url: str, use_cache: bool = True):
+    """
+    Scrapes a URL using Firecrawl.dev API, serving recent scrapes from the local
+    cache. A scrape still unanswered after FIRECRAWL_HEDGE_AFTER seconds is
+    hedged with a second request, and whichever returns content first wins.
+    """
+    if use_cache:
+        cached = get_cached_scrape(url)
+        if cached is not None:
+            return cached
 
-def scrape_url(url: str):
-    """Scrapes a URL using Firecrawl.dev API."""
+    if FIRECRAWL_HEDGE_AFTER > 0:
+        data = hedged_call(_fetch_scrape, url, delay=FIRECRAWL_HEDGE_AFTER, accept=lambda data: bool(data and data.get('markdown')))
+    else:
+        data = _fetch_scrape(url)
+    if use_cache and data and data.get('markdown'):
+        store_scrape(url, data)
+    return data
+
+def revalidate_scrape(url: str):
+    """
+    Scrapes a URL for a refresh run, where a cached copy may be outdated.
+    The cached copy (even an expired one) is revalidated with a conditional
+    HEAD request to the page itself; when the site answers 304 Not Modified,
+    or repeats the same ETag/Last-Modified, the copy is served and kept for
+    another TTL without calling Firecrawl. A copy cached without validators
+    (every ordinary scrape) is served as it is while it is still fresh, as
+    there is nothing to revalidate it with. Otherwise the page is scraped
+    again and cached with the validators of the HEAD response. Returns the
+    Firecrawl data, or None on error.
+    """
+    entry = get_scrape_entry(url)
+    cached_validators = (entry or {}).get("validators") or {}
+    if entry and not cached_validators and entry.get("fresh_until", 0) >= time.time():
+        tracing.count("refresh.fresh_cache")
+        return entry["data"]
+    not_modified, validators = _check_not_modified(url, cached_validators)
+    if entry and not_modified:
+        tracing.count("refresh.not_modified")
+        store_scrape(url, entry["data"], validators=validators)
+        return entry["data"]
+
+    data = scrape_url(url, use_cache=False)
+    if data and data.get('markdown'):
+        store_scrape(url, data, validators=validators)
+    return data
+
+def _check_not_modified(url: str, validators: dict):
+    """
+    Sends a HEAD request for `url`, conditional on the given validators, and
+    returns (not modified, the response's validators). Any error counts as modified.
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    try:
+        response = http_client.request("origin", "HEAD", url, headers=headers, allow_redirects=True)
+    except requests.exceptions.RequestException:
+        return False, {}
+    current = {
+        key: value for key, value in (
+            ("etag", response.headers.get("ETag")),
+            ("last_modified", response.headers.get("Last-Modified")),
+        ) if value
+    }
+    if response.status_code == 304:
+        return bool(headers), validators
+    if not response.ok or not current:
+        return False, current
+    # Sites that ignore conditional headers still reveal a change through their validators
+    return bool(headers) and current == validators, current
+
+def _fetch_scrape(url: str):
+    """Calls Firecrawl for one URL and returns its data, or None on error."""
     headers = {
         "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
         "Content-Type": "application/json"
@@ -18,7 +96,7 @@ def scrape_url(url: str):
     }
 
     try:
-        response = requests.post(FIRECRAWL_API_URL, json=payload, headers=headers)
+        response = http_client.post("firecrawl", FIRECRAWL_API_URL, json=payload, headers=headers)
         response.raise_for_status()
         return response.json().get('data', {})
     except requests.exceptions.RequestException as e:
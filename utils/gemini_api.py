@@ -1,12 +1,14 @@
-import os
 import requests
 import json
-from dotenv import load_dotenv
+from utils import http_client, tracing
+from utils.config import env_str
 
-load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={GEMINI_API_KEY}"
+GEMINI_API_KEY = env_str("GEMINI_API_KEY")
+# Point GEMINI_API_BASE at a local stand-in server to run without real API calls
+GEMINI_API_BASE = env_str("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+GEMINI_MODEL = env_str("GEMINI_MODEL", "gemini-1.5-flash-latest")
+GEMINI_API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_STREAM_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
 
 def call_gemini(prompt: str):
     payload = {
@@ -18,13 +20,65 @@ def call_gemini(prompt: str):
     }
     headers = {'Content-Type': 'application/json'}
 
-    try:
-        response = requests.post(GEMINI_API_URL, json=payload, headers=headers)
+    with tracing.span("gemini generateContent", "llm") as attrs:
+        try:
+            response = http_client.post("gemini", GEMINI_API_URL, json=payload, headers=headers)
+            response.raise_for_status()
+            body = response.json()
+            _record_usage(attrs, body)
+            content = body['candidates'][0]['content']['parts'][0]['text']
+            return content
+        except requests.exceptions.RequestException as e:
+            attrs["error"] = type(e).__name__
+            print(f"Error calling Gemini API: {e}")
+            return None
+
+def _record_usage(attrs: dict, body: dict):
+    """Copies the token counts of a Gemini response into span attributes."""
+    usage = body.get('usageMetadata')
+    if usage:
+        attrs["prompt_tokens"] = usage.get('promptTokenCount', 0)
+        attrs["output_tokens"] = usage.get('candidatesTokenCount', 0)
+
+def stream_gemini(prompt: str):
+    """Yields the text fragments of a Gemini response as the server streams them (SSE)."""
+    payload = {
+        "contents": [
+            {
+                "parts": [{"text": prompt}]
+            }
+        ]
+    }
+    headers = {'Content-Type': 'application/json'}
+
+    with tracing.span("gemini streamGenerateContent", "llm") as attrs, \
+            http_client.post("gemini", GEMINI_STREAM_URL, json=payload, headers=headers, stream=True) as response:
         response.raise_for_status()
-        content = response.json()['candidates'][0]['content']['parts'][0]['text']
-        return content
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling Gemini API: {e}")
+        for line in response.iter_lines(decode_unicode=True):
+            # Each server-sent event carries one GenerateContentResponse as JSON
+            if not line or not line.startswith("data:"):
+                continue
+            chunk = json.loads(line[len("data:"):])
+            # Usage counts are cumulative, so the last chunk carries the totals
+            _record_usage(attrs, chunk)
+            for candidate in chunk.get('candidates', [])[:1]:
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+
+def call_gemini_streaming(prompt: str, on_token):
+    """
+    Same contract as `call_gemini`, but streams the response and passes every
+    text fragment to `on_token` as soon as it arrives.
+    """
+    fragments = []
+    try:
+        for fragment in stream_gemini(prompt):
+            fragments.append(fragment)
+            on_token(fragment)
+        return "".join(fragments)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error calling Gemini streaming API: {e}")
         return None
 
 def generate_sub_queries(query: str) -> list:
@@ -40,17 +94,14 @@ Sub-queries (JSON list of strings):"""
         try:
             # Clean the response to extract only the JSON part
             json_str = response_text.strip().replace('```json', '').replace('```', '').strip()
-            return json.loads(json_str)
+            sub_queries = json.loads(json_str)
         except json.JSONDecodeError:
             print("Error: Failed to decode JSON from Gemini response.")
             return []
+        if isinstance(sub_queries, list):
+            return [sub_query for sub_query in sub_queries if isinstance(sub_query, str)]
     return []
 
-def filter_relevant_chunks(chunks: list, query: str):
-    """Filters relevant chunks using Gemini API."""
-    # This function will be implemented later
-    pass
-
 def generate_research_plan(query: str) -> str:
     """Generates a step-by-step research plan in JSON format."""
     prompt = f"""You are an expert research assistant. Your task is to create a step-by-step plan to answer a user's query.
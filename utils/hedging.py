@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.config import env_int
+from utils import tracing
+
+# Threads shared by every hedged call; a saturated pool simply delays the backups
+HEDGE_MAX_WORKERS = env_int("HEDGE_MAX_WORKERS", 16)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+        return _executor
+
+def hedged_call(fn, *args, delay: float, hedges: int = 1, accept=bool):
+    """
+    Calls `fn(*args)` and, each time `delay` seconds pass without an acceptable
+    result, starts another identical call, up to `hedges` backups. Returns the
+    first result that `accept` approves, otherwise the last result (or raises
+    the last error). Calls that lose the race are left to finish in the
+    background and their results are dropped.
+    """
+    executor = get_executor()
+    call = tracing.bind(fn)
+    pending = {executor.submit(call, *args)}
+    launched = 0
+    last_result, last_error = None, None
+    while pending:
+        done, pending = wait(pending, timeout=delay if launched < hedges else None, return_when=FIRST_COMPLETED)
+        if not done:
+            pending.add(executor.submit(call, *args))
+            launched += 1
+            tracing.count("hedge.launched")
+            continue
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if accept(result):
+                return result
+            last_result, last_error = result, None
+    if last_error is not None:
+        raise last_error
+    return last_result
@@ -1,25 +1,65 @@
 import re
+from functools import lru_cache
+from utils.blob_store import is_blob_handle, resolve
 
-def get_value_from_path(data, path):
-    """Gets a value from a nested dictionary using a dot-separated path."""
-    keys = path.split('.')
-    current = data
-    for key in keys:
-        match = re.match(r"(.*?)\[(\d+)\]", key)
-        if match:
-            list_name, index = match.groups()
-            current = current.get(list_name, [])
-            if isinstance(current, list) and len(current) > int(index):
-                current = current[int(index)]
+INDEXED_KEY_PATTERN = re.compile(r"(.*?)\[(\d+)\]")
+
+class PathAccessor:
+    """
+    A reference path such as `step_1.urls[0]`, parsed once into its keys and
+    list indexes so that resolving it does no string work.
+    """
+    __slots__ = ("path", "parts")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parts = []
+        for key in path.split('.'):
+            match = INDEXED_KEY_PATTERN.match(key)
+            if match:
+                list_name, index = match.groups()
+                self.parts.append((list_name, int(index)))
+            else:
+                self.parts.append((key, None))
+
+    @property
+    def head(self) -> str:
+        """The first key of the path, i.e. the step id for step references."""
+        return self.parts[0][0]
+
+    def get(self, data):
+        """Returns the raw value at the path, or None when any part is missing."""
+        current = data
+        for key, index in self.parts:
+            if index is not None:
+                current = current.get(key, []) if isinstance(current, dict) else []
+                if isinstance(current, list) and len(current) > index:
+                    current = current[index]
+                else:
+                    return None
+            elif isinstance(current, dict) and key in current:
+                current = current[key]
             else:
                 return None
-        elif isinstance(current, dict) and key in current:
-            current = current[key]
-        else:
-            return None
+        return current
+
+@lru_cache(maxsize=4096)
+def compile_path(path: str) -> PathAccessor:
+    """Returns the parsed accessor for a path; each distinct path is parsed once per process."""
+    return PathAccessor(path)
+
+def get_value_from_path(data, path):
+    """
+    Gets a value from a nested dictionary using a dot-separated path. Values
+    spilled to the blob store are loaded only when a path resolves to them.
+    """
+    current = compile_path(path).get(data)
+
+    if is_blob_handle(current):
+        return resolve(current)
 
     # If the final resolved value is a dictionary from a search result, extract the link
     if isinstance(current, dict) and 'link' in current:
         return current['link']
-        
+
     return current
@@ -0,0 +1,118 @@
+import time
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from utils.config import env_int, env_float
+from utils import tracing
+from utils.rate_limit import get_limiter, backoff_delay, retry_after_delay, RETRYABLE_STATUS_CODES
+
+# Connections kept alive per provider; size it to the number of concurrent calls
+HTTP_POOL_MAXSIZE = env_int("HTTP_POOL_MAXSIZE", 32)
+HTTP_CONNECT_TIMEOUT = env_float("HTTP_CONNECT_TIMEOUT", 5)
+
+# Read timeouts (seconds) per provider. Gemini generates long reports, so it gets the most room.
+PROVIDER_READ_TIMEOUTS = {
+    "gemini": env_float("GEMINI_TIMEOUT", 120),
+    "serpapi": env_float("SERPAPI_TIMEOUT", 20),
+    "firecrawl": env_float("FIRECRAWL_TIMEOUT", 60),
+    # Conditional requests straight to the scraped sites, made when a refresh revalidates a page
+    "origin": env_float("ORIGIN_TIMEOUT", 10),
+}
+DEFAULT_READ_TIMEOUT = env_float("HTTP_READ_TIMEOUT", 30)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_timeout(provider: str):
+    """Returns the (connect, read) timeout tuple for a provider."""
+    return (HTTP_CONNECT_TIMEOUT, PROVIDER_READ_TIMEOUTS.get(provider, DEFAULT_READ_TIMEOUT))
+
+def get_session(provider: str) -> requests.Session:
+    """Returns the shared, connection-pooled Session for a provider, creating it on first use."""
+    session = _sessions.get(provider)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+    return session
+
+def request(provider: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Sends a request over the provider's pooled session with the provider's timeout.
+
+    Every attempt waits for the provider's rate limit and adaptive concurrency
+    slot. Connection errors, timeouts and retryable status codes (429, 5xx) are
+    retried with jittered exponential backoff, honouring Retry-After. When the
+    retries run out the last response is returned (or the last error raised),
+    so callers keep handling failures with `raise_for_status()`.
+    """
+    kwargs.setdefault("timeout", get_timeout(provider))
+    session = get_session(provider)
+    limiter = get_limiter(provider)
+
+    attempt = 0
+    while True:
+        with limiter.slot(), tracing.span(f"{provider} {method}", "http", provider=provider, attempt=attempt) as attrs:
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                attrs["error"] = type(e).__name__
+                limiter.record(False)
+                if attempt >= limiter.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                attrs["status"] = response.status_code
+                attrs["request_bytes"] = len(response.request.body or b"")
+                # Streamed bodies are not read here, so fall back to their Content-Length
+                if kwargs.get("stream"):
+                    attrs["response_bytes"] = int(response.headers.get("Content-Length") or 0)
+                else:
+                    attrs["response_bytes"] = len(response.content)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    limiter.record(True)
+                    return response
+                limiter.record(False)
+                if attempt >= limiter.max_retries:
+                    return response
+                delay = retry_after_delay(response)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                response.close()
+        print(f"Info: {provider} call failed, retrying in {delay:.1f}s (attempt {attempt + 1}/{limiter.max_retries}).")
+        time.sleep(delay)
+        attempt += 1
+
+def get(provider: str, url: str, **kwargs) -> requests.Response:
+    return request(provider, "GET", url, **kwargs)
+
+def post(provider: str, url: str, **kwargs) -> requests.Response:
+    return request(provider, "POST", url, **kwargs)
+
+async def async_request(provider: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Awaitable version of `request`. The call runs on a worker thread against the
+    same pooled session, so sync and async callers share connections.
+    """
+    return await asyncio.to_thread(request, provider, method, url, **kwargs)
+
+async def async_get(provider: str, url: str, **kwargs) -> requests.Response:
+    return await async_request(provider, "GET", url, **kwargs)
+
+async def async_post(provider: str, url: str, **kwargs) -> requests.Response:
+    return await async_request(provider, "POST", url, **kwargs)
+
+def close_sessions():
+    """Closes every pooled session, e.g. on worker shutdown."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
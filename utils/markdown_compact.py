@@ -0,0 +1,208 @@
+"""
+Compaction of scraped markdown before it reaches graph state and the prompt.
+
+Firecrawl markdown carries a lot that Gemini has to read but never needs:
+images, navigation lists made of links, cookie and footer boilerplate,
+breadcrumbs repeated on every section, long tracking URLs and padded tables.
+The page is streamed line by line through a chain of generator stages, so
+apart from the input and the compacted output only the current line is held.
+"""
+import re
+from urllib.parse import urlsplit
+from utils.tokens import count_tokens
+from utils.config import env_int, env_bool
+from utils import tracing
+
+COMPACTION_ENABLED = env_bool("COMPACTION_ENABLED", True)
+# Runs of at least this many link-only lines are treated as navigation and dropped
+COMPACTION_MIN_LINK_RUN = env_int("COMPACTION_MIN_LINK_RUN", 3)
+# Menu entries are a few words long; a link run with longer link texts (titles in a reference list) is content
+COMPACTION_NAV_LINK_WORDS = env_int("COMPACTION_NAV_LINK_WORDS", 4)
+# Bare URLs are cut to their host and path, and the path to this many characters
+COMPACTION_MAX_URL_CHARS = env_int("COMPACTION_MAX_URL_CHARS", 60)
+
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_PATTERN = re.compile(r"\[([^\]]*)\]\(([^)]*)\)")
+URL_PATTERN = re.compile(r"https?://[^\s)>\]]+")
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+ORDERED_LIST_PATTERN = re.compile(r"^\s*\d+[.)]\s+")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$")
+# Phrases that navigation and footer lines are made of. A line is only dropped
+# when every separated part of it is one of them, so "Design in practice" or a
+# sentence mentioning a login stays
+BOILERPLATE_PHRASE_PATTERN = re.compile(
+    r"\b(?:sign (?:in|up|out)|log ?(?:in|out)|subscribe(?: to (?:our|the) newsletter)?|"
+    r"share(?: (?:on|this|via)(?: \w+)?)?|follow us(?: on \w+)?|back to top|skip to (?:main )?content|"
+    r"privacy policy|terms (?:of (?:use|service)|and conditions)|cookie (?:policy|settings|preferences)|"
+    r"accept(?: all)? cookies|table of contents)\b",
+    re.IGNORECASE,
+)
+# Copyright notices and cookie banners, recognized by how the whole line starts or ends
+NOTICE_PATTERN = re.compile(
+    r"^(?:©|\(c\)\s*\d{4}\b|copyright\b|we use cookies\b|this (?:web)?site uses cookies\b)|\ball rights reserved\.?$",
+    re.IGNORECASE,
+)
+SEPARATOR_PATTERN = re.compile(r"\s*[|·•»›/]\s*|\s+[-–—]\s+")
+# Breadcrumbs and inline menus end in a separator
+NAV_LINE_ENDINGS = ("|", "·", "•", "»", "›", "/", ">")
+# Boilerplate is only recognized in short lines, so real paragraphs stay
+BOILERPLATE_MAX_CHARS = 120
+REPEATED_LINE_MAX_CHARS = 80
+
+def _lines(markdown: str):
+    """Yields (in_code_block, line) without splitting or copying the page."""
+    in_code = False
+    for match in re.finditer(r"^.*$", markdown, re.MULTILINE):
+        line = match.group(0).rstrip("\r")
+        if line.lstrip().startswith(("```", "~~~")):
+            yield True, line
+            in_code = not in_code
+            continue
+        yield in_code, line
+
+def _strip_images(lines):
+    for in_code, line in lines:
+        yield in_code, line if in_code else IMAGE_PATTERN.sub("", line)
+
+def _is_link_only(line: str) -> bool:
+    text = LIST_MARKER_PATTERN.sub("", line).strip()
+    if not text or "](" not in text:
+        return False
+    return not LINK_PATTERN.sub("", text).strip(" |·•-–—,;")
+
+def _is_navigation(run: list) -> bool:
+    """
+    True for a run of link-only lines that reads like a menu, footer or tag
+    cloud: long enough, unnumbered, and made of short link texts.
+    """
+    link_lines = [line for _, line in run if line.strip()]
+    if len(link_lines) < COMPACTION_MIN_LINK_RUN:
+        return False
+    for line in link_lines:
+        if ORDERED_LIST_PATTERN.match(line):
+            return False
+        if any(len(match.group(1).split()) > COMPACTION_NAV_LINK_WORDS for match in LINK_PATTERN.finditer(line)):
+            return False
+    return True
+
+def _collapse_link_runs(lines):
+    """Drops runs of link-only lines that look like navigation; other runs are kept as they were."""
+    run = []
+    for in_code, line in lines:
+        if not in_code and _is_link_only(line):
+            run.append((in_code, line))
+            continue
+        if not in_code and line.strip() == "" and run:
+            # Blank lines inside a menu do not end it, but stay with the run in case it is kept
+            run.append((in_code, line))
+            continue
+        if not _is_navigation(run):
+            yield from run
+        run = []
+        yield in_code, line
+    if not _is_navigation(run):
+        yield from run
+
+def shorten_url(url: str) -> str:
+    """Cuts a URL to host and path, dropping the scheme, query string and fragment."""
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    if len(path) > COMPACTION_MAX_URL_CHARS:
+        path = path[:COMPACTION_MAX_URL_CHARS] + "…"
+    return parts.netloc + path
+
+def _shorten_links(lines):
+    """Keeps the text of inline links and shortens bare URLs."""
+    for in_code, line in lines:
+        if not in_code:
+            line = LINK_PATTERN.sub(lambda match: match.group(1).strip() or shorten_url(match.group(2)), line)
+            line = URL_PATTERN.sub(lambda match: shorten_url(match.group(0)), line)
+        yield in_code, line
+
+def _is_boilerplate(text: str) -> bool:
+    """True for a short line made only of navigation/footer phrases, or a copyright or cookie notice."""
+    if len(text) > BOILERPLATE_MAX_CHARS or text.startswith("#"):
+        return False
+    text = LIST_MARKER_PATTERN.sub("", LINK_PATTERN.sub(lambda match: match.group(1), text)).strip()
+    if NOTICE_PATTERN.search(text):
+        return True
+    parts = [part.strip(" .:!*_") for part in SEPARATOR_PATTERN.split(text)]
+    parts = [part for part in parts if part]
+    return bool(parts) and all(BOILERPLATE_PHRASE_PATTERN.fullmatch(part) for part in parts)
+
+def _is_nav_like(text: str) -> bool:
+    """True for link-only lines and lines ending in a separator, such as menus and breadcrumbs."""
+    return _is_link_only(text) or text.endswith(NAV_LINE_ENDINGS)
+
+def _drop_boilerplate(lines):
+    """
+    Drops short boilerplate lines, and short nav-like lines (menus,
+    breadcrumbs) already seen on the page. Repeated headings and list items
+    are content and stay.
+    """
+    seen = set()
+    for in_code, line in lines:
+        text = line.strip()
+        if in_code or not text or text.startswith("|"):
+            yield in_code, line
+            continue
+        if _is_boilerplate(text):
+            continue
+        if len(text) <= REPEATED_LINE_MAX_CHARS and _is_nav_like(text):
+            key = text.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        yield in_code, line
+
+def _normalize_tables(lines):
+    """Removes cell padding and shortens separator rows."""
+    for in_code, line in lines:
+        text = line.strip()
+        if not in_code and text.startswith("|"):
+            if TABLE_SEPARATOR_PATTERN.match(text):
+                line = "|" + "|".join("---" for _ in text.strip("|").split("|")) + "|"
+            else:
+                line = "| " + " | ".join(cell.strip() for cell in text.strip("|").split("|")) + " |"
+        yield in_code, line
+
+def _normalize_whitespace(lines):
+    """Collapses runs of spaces and blank lines outside code blocks."""
+    blank = True
+    for in_code, line in lines:
+        if in_code:
+            blank = False
+            yield line.rstrip()
+            continue
+        line = re.sub(r"[ \t]{2,}", " ", line).rstrip()
+        if not line.strip():
+            if not blank:
+                yield ""
+            blank = True
+            continue
+        blank = False
+        yield line
+
+def iter_compacted(markdown: str):
+    """Yields the compacted lines of a page."""
+    lines = _lines(markdown)
+    # Boilerplate is dropped while the links are still there to tell menus from content
+    for stage in (_strip_images, _collapse_link_runs, _drop_boilerplate, _shorten_links, _normalize_tables):
+        lines = stage(lines)
+    return _normalize_whitespace(lines)
+
+def compact_markdown(markdown: str, source: str = None) -> dict:
+    """
+    Compacts a scraped page and returns {"content", "tokens_before", "tokens_after"}.
+    With compaction disabled the page is returned unchanged.
+    """
+    tokens_before = count_tokens(markdown)
+    if not COMPACTION_ENABLED or not markdown:
+        return {"content": markdown, "tokens_before": tokens_before, "tokens_after": tokens_before}
+
+    content = "\n".join(iter_compacted(markdown)).strip()
+    tokens_after = count_tokens(content)
+    tracing.count("compaction.tokens_before", tokens_before)
+    tracing.count("compaction.tokens_after", tokens_after)
+    print(f"Info: Compacted {source or 'page'} from {tokens_before} to {tokens_after} tokens.")
+    return {"content": content, "tokens_before": tokens_before, "tokens_after": tokens_after}
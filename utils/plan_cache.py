@@ -0,0 +1,166 @@
+import re
+import copy
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from utils.search_cache import normalize_query, query_words
+from utils.retrieval import STOPWORDS
+from utils.config import env_int, env_float, env_bool
+
+PLAN_CACHE_ENABLED = env_bool("PLAN_CACHE_ENABLED", True)
+PLAN_CACHE_TTL = env_float("PLAN_CACHE_TTL", 3600)
+PLAN_CACHE_MAX_ENTRIES = env_int("PLAN_CACHE_MAX_ENTRIES", 256)
+# Jaccard similarity of character shingles above which two queries share a plan
+PLAN_CACHE_SIMILARITY = env_float("PLAN_CACHE_SIMILARITY", 0.75)
+SHINGLE_SIZE = 3
+
+def shingles(text: str) -> frozenset:
+    """Returns the set of character shingles of a normalized query."""
+    padded = f" {text} "
+    if len(padded) <= SHINGLE_SIZE:
+        return frozenset([padded])
+    return frozenset(padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1))
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def query_replacements(cached_key: str, query: str):
+    """
+    Returns the (old, new) word runs that turn the normalized cached query into
+    `query`, e.g. [("2021", "2024")], or None when a word other than a stopword
+    was added, dropped or moved, which no rewrite of the plan can account for.
+    """
+    old_words = cached_key.split()
+    new_words = normalize_query(query).split()
+    # The same words as typed, so a rewritten search keeps the user's casing
+    typed_words = query_words(unicodedata.normalize("NFKC", query))
+    if len(typed_words) != len(new_words):
+        typed_words = new_words
+    replacements = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(a=old_words, b=new_words, autojunk=False).get_opcodes():
+        if tag == "replace":
+            replacements.append((old_words[i1:i2], " ".join(typed_words[j1:j2])))
+        elif tag != "equal" and not all(word in STOPWORDS for word in old_words[i1:i2] + new_words[j1:j2]):
+            return None
+    return replacements
+
+def rewrite_searches(plan: list, cached_key: str, query: str):
+    """
+    Adapts a plan cached for a near-duplicate query to `query` by applying the
+    word replacements between the two queries to its literal search inputs and
+    fan-out sub-queries. A search of the cached query itself becomes a search
+    of `query`. Returns None when the queries differ in a way the searches
+    cannot be rewritten for.
+    """
+    replacements = query_replacements(cached_key, query)
+    if replacements is None:
+        return None
+    patterns = [
+        (re.compile(r"(?<!\w)" + r"\W+".join(map(re.escape, old)) + r"(?!\w)", re.IGNORECASE), new)
+        for old, new in replacements
+    ]
+
+    def rewrite(text: str) -> str:
+        if normalize_query(text) == cached_key:
+            return query
+        for pattern, new in patterns:
+            text = pattern.sub(lambda match: new, text)
+        return text
+
+    for step in plan:
+        step_input = step.get("input")
+        if step.get("action") != "search_google" or not isinstance(step_input, str) or step_input.startswith("step_"):
+            continue
+        step["input"] = rewrite(step_input)
+        if "sub_queries" in step:
+            step["sub_queries"] = [rewrite(sub_query) for sub_query in step["sub_queries"]]
+    return plan
+
+class PlanCache:
+    """
+    A bounded LRU of validated research plans. Lookups match the normalized
+    query exactly first, then fall back to the most similar cached query whose
+    shingle similarity reaches `threshold`. A near-duplicate's plan is only
+    returned with its searches rewritten for the new query (see
+    `rewrite_searches`), so "Rust 2024" never runs the searches of "Rust 2021".
+    """
+
+    def __init__(self, ttl: float, max_entries: int, threshold: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] < now]:
+            del self._entries[key]
+
+    def get(self, query: str):
+        """Returns a copy of the cached plan for `query` or a near-duplicate of it, or None."""
+        key = normalize_query(query)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                query_shingles = shingles(key)
+                best_key, best_score = None, 0.0
+                for candidate_key, candidate in self._entries.items():
+                    score = jaccard(query_shingles, candidate["shingles"])
+                    if score > best_score:
+                        best_key, best_score = candidate_key, score
+                plan = None
+                if best_key is not None and best_score >= self.threshold:
+                    plan = rewrite_searches(copy.deepcopy(self._entries[best_key]["plan"]), best_key, query)
+                if plan is None:
+                    self.misses += 1
+                    return None
+                self.near_hits += 1
+                self._entries.move_to_end(best_key)
+                return plan
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry["plan"])
+
+    def set(self, query: str, plan: list):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = {
+                "plan": copy.deepcopy(plan),
+                "shingles": shingles(key),
+                "expires_at": time.time() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> PlanCache:
+    """Returns the process-wide plan cache, or None when caching is disabled."""
+    global _cache
+    if not PLAN_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PlanCache(PLAN_CACHE_TTL, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_SIMILARITY)
+        return _cache
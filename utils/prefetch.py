@@ -0,0 +1,170 @@
+"""
+Speculative prefetch of a run's first search and scrapes.
+
+With speculation on, the planning node searches the original query while
+Gemini is still writing the plan, and the top results are scraped as soon as
+the search returns. The futures land in a per-run table that the execution
+node consumes when it reaches a matching step. Work the plan turns out not to
+need is cancelled; a call that has already started cannot be interrupted, so
+its result is simply discarded and counted as `prefetch.wasted`. With search
+fan-out on, the scrapes follow the raw ranking of the original query, while
+the plan scrapes the fused ranking of all its queries, so some waste is
+expected; the counter shows how much.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from utils.serp_api import search_web
+from utils.search_fanout import SEARCH_FANOUT_ENABLED, SEARCH_FANOUT_DEPTH
+from utils.firecrawl_api import scrape_url
+from utils.search_cache import normalize_query
+from utils.scrape_cache import normalize_url
+from utils.config import env_int, env_bool
+from utils import tracing
+
+PREFETCH_ENABLED = env_bool("PREFETCH_ENABLED", False)
+PREFETCH_MAX_WORKERS = env_int("PREFETCH_MAX_WORKERS", 8)
+# Top search results scraped ahead of the plan
+PREFETCH_SCRAPES = env_int("PREFETCH_SCRAPES", 2)
+
+class Prefetch:
+    """The speculative work of one run: a search future and scrape futures keyed by normalized URL."""
+
+    def __init__(self, query: str, trace=None):
+        self.query = query
+        self.query_key = normalize_query(query)
+        # Counters are recorded on the run's trace, as `release` runs outside of it
+        self.trace = trace
+        self.search = None
+        self.search_taken = False
+        self.scrapes = {}
+        # URLs already scraped by the execution node, which need no prefetch
+        self.taken = set()
+        # Set once no more scrapes should be started
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1):
+        if self.trace is not None:
+            self.trace.count(name, value)
+
+    def cancel(self, futures) -> int:
+        """Cancels `futures`. Those already running or done were paid for and count as wasted."""
+        cancelled = 0
+        for future in futures:
+            if future.cancel():
+                cancelled += 1
+        if cancelled:
+            self.count("prefetch.cancelled", cancelled)
+        if len(futures) > cancelled:
+            self.count("prefetch.wasted", len(futures) - cancelled)
+        return cancelled
+
+_executor = None
+_executor_lock = threading.Lock()
+_runs = {}
+_runs_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+def _search_and_scrape(prefetch: Prefetch) -> list:
+    """Runs the speculative search, then queues a scrape for each top result."""
+    # A fan-out search fuses the full ranking of the query, so fetch as deep a one
+    results = search_web(prefetch.query, limit=SEARCH_FANOUT_DEPTH if SEARCH_FANOUT_ENABLED else None)
+    with prefetch.lock:
+        if prefetch.closed:
+            return results
+        for result in results[:PREFETCH_SCRAPES]:
+            url = result.get("link") if isinstance(result, dict) else None
+            if not url:
+                continue
+            key = normalize_url(url)
+            if key in prefetch.scrapes or key in prefetch.taken:
+                continue
+            prefetch.scrapes[key] = get_executor().submit(tracing.bind(scrape_url), url)
+    return results
+
+def start(run_id: str, query: str):
+    """Starts searching `query` (and scraping its top results) for a run, once per run."""
+    if not run_id or not query:
+        return
+    with _runs_lock:
+        if run_id in _runs:
+            return
+        prefetch = _runs[run_id] = Prefetch(query, tracing.get_trace(run_id))
+    with prefetch.lock:
+        prefetch.search = get_executor().submit(tracing.bind(_search_and_scrape), prefetch)
+
+def _result(future):
+    """Waits for a prefetched result; None when the work was cancelled or failed."""
+    try:
+        return future.result()
+    except CancelledError:
+        return None
+    except Exception as e:
+        print(f"Info: Prefetch failed ({type(e).__name__}: {e}), running the step normally.")
+        return None
+
+def take_search(run_id: str, query: str):
+    """Returns the prefetched results for `query`, waiting if the search is in flight, or None."""
+    with _runs_lock:
+        prefetch = _runs.get(run_id)
+    if prefetch is None or prefetch.search is None or normalize_query(query or "") != prefetch.query_key:
+        return None
+    prefetch.search_taken = True
+    results = _result(prefetch.search)
+    if results:
+        tracing.count("prefetch.search_hit")
+    return results
+
+def take_scrape(run_id: str, url: str):
+    """Returns the prefetched Firecrawl data for `url`, waiting if the scrape is in flight, or None."""
+    with _runs_lock:
+        prefetch = _runs.get(run_id)
+    if prefetch is None:
+        return None
+    key = normalize_url(url)
+    with prefetch.lock:
+        future = prefetch.scrapes.pop(key, None)
+        prefetch.taken.add(key)
+    if future is None:
+        return None
+    data = _result(future)
+    if data:
+        tracing.count("prefetch.scrape_hit")
+    return data
+
+def retain(run_id: str, urls):
+    """
+    Stops further prefetching for a run and cancels the queued scrapes of any
+    URL not in `urls`. Called once every search in the plan has run, when the
+    full set of pages the plan will scrape is known.
+    """
+    with _runs_lock:
+        prefetch = _runs.get(run_id)
+    if prefetch is None:
+        return
+    wanted = {normalize_url(url) for url in urls}
+    with prefetch.lock:
+        prefetch.closed = True
+        unused = [key for key in prefetch.scrapes if key not in wanted]
+        futures = [prefetch.scrapes.pop(key) for key in unused]
+    prefetch.cancel(futures)
+
+def release(run_id: str):
+    """Drops a run's prefetch table and cancels whatever it never consumed."""
+    with _runs_lock:
+        prefetch = _runs.pop(run_id, None)
+    if prefetch is None:
+        return
+    with prefetch.lock:
+        prefetch.closed = True
+        futures = list(prefetch.scrapes.values())
+        prefetch.scrapes.clear()
+    if prefetch.search is not None and not prefetch.search_taken:
+        futures.append(prefetch.search)
+    prefetch.cancel(futures)
@@ -0,0 +1,148 @@
+import time
+import random
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from utils.config import env_int, env_float
+
+HTTP_MAX_RETRIES = env_int("HTTP_MAX_RETRIES", 3)
+HTTP_BACKOFF_BASE = env_float("HTTP_BACKOFF_BASE", 0.5)
+HTTP_BACKOFF_MAX = env_float("HTTP_BACKOFF_MAX", 30)
+
+# Status codes that mean "try again later" rather than "this request is wrong"
+RETRYABLE_STATUS_CODES = frozenset([408, 429, 500, 502, 503, 504])
+
+# Per-provider defaults: requests per second, bucket size, and concurrency bounds
+PROVIDER_DEFAULTS = {
+    "gemini": {"rate": 5.0, "burst": 10, "initial": 4, "max": 16},
+    "serpapi": {"rate": 5.0, "burst": 10, "initial": 4, "max": 16},
+    "firecrawl": {"rate": 5.0, "burst": 10, "initial": 4, "max": 16},
+    # Revalidation requests go to many different sites and are only worth a single try
+    "origin": {"rate": 20.0, "burst": 20, "initial": 8, "max": 32, "retries": 0},
+}
+DEFAULT_LIMITS = {"rate": 10.0, "burst": 10, "initial": 4, "max": 16}
+
+class TokenBucket:
+    """A thread-safe token bucket: `acquire` blocks until a token is available."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Bounds in-flight calls with an AIMD limit: every success raises the limit by
+    1/limit (about +1 per round of calls), and a failure halves it, at most
+    once per `cooldown` seconds so one burst of errors counts as one signal.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, decrease: float = 0.5, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record(self, success: bool):
+        with self._condition:
+            if success:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            self._condition.notify_all()
+
+class ProviderLimiter:
+    """The rate limit, adaptive concurrency limit and retry policy for one provider."""
+
+    def __init__(self, rate: float, burst: int, initial: int, maximum: int, max_retries: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial, maximum=maximum)
+        self.max_retries = max_retries
+
+    @contextmanager
+    def slot(self):
+        """Waits for both a rate token and a concurrency slot for one call."""
+        self.concurrency.acquire()
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            self.concurrency.release()
+
+    def record(self, success: bool):
+        self.concurrency.record(success)
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+def retry_after_delay(response) -> float:
+    """Returns the delay requested by a Retry-After header in seconds, or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return min(HTTP_BACKOFF_MAX, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        return min(HTTP_BACKOFF_MAX, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+    except (TypeError, ValueError):
+        return None
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """
+    Returns the shared limiter for a provider. Limits can be overridden with
+    <PROVIDER>_RATE_PER_SEC, <PROVIDER>_BURST, <PROVIDER>_CONCURRENCY and
+    <PROVIDER>_MAX_CONCURRENCY and <PROVIDER>_MAX_RETRIES, e.g. FIRECRAWL_RATE_PER_SEC=2.
+    """
+    limiter = _limiters.get(provider)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        if provider not in _limiters:
+            defaults = PROVIDER_DEFAULTS.get(provider, DEFAULT_LIMITS)
+            prefix = provider.upper()
+            _limiters[provider] = ProviderLimiter(
+                rate=env_float(f"{prefix}_RATE_PER_SEC", defaults["rate"]),
+                burst=env_int(f"{prefix}_BURST", defaults["burst"]),
+                initial=env_int(f"{prefix}_CONCURRENCY", defaults["initial"]),
+                maximum=env_int(f"{prefix}_MAX_CONCURRENCY", defaults["max"]),
+                max_retries=env_int(f"{prefix}_MAX_RETRIES", defaults.get("retries", HTTP_MAX_RETRIES)),
+            )
+        return _limiters[provider]
@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from utils.sqlite_store import SQLiteStore, lazy_store
+from utils.search_cache import normalize_query
+from utils.config import env_str, env_float, env_bool
+
+RESULT_STORE_ENABLED = env_bool("RESULT_STORE_ENABLED", True)
+RESULT_STORE_PATH = env_str("RESULT_STORE_PATH", ".cache/results.sqlite3")
+# Answers at most this many seconds old are re-served for an identical query (0 = never)
+RESULT_REUSE_TTL = env_float("RESULT_REUSE_TTL", 0)
+# Optional JSON export of every finished run, e.g. research_result.json (empty = no export)
+RESULT_EXPORT_PATH = env_str("RESULT_EXPORT_PATH", "")
+
+class ResultStore(SQLiteStore):
+    """
+    Finished research results in SQLite, keyed by run id and indexed by the
+    normalized query, so concurrent runs never overwrite each other and a
+    recent answer to the same question can be found without scanning. Runs
+    that ended without an answer are kept for inspection but never re-served.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                result TEXT NOT NULL,
+                succeeded INTEGER NOT NULL DEFAULT 1
+            )"""
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+        if "succeeded" not in columns:
+            # Stores from before the column existed also hold failed runs, so mark those
+            conn.execute("ALTER TABLE results ADD COLUMN succeeded INTEGER NOT NULL DEFAULT 1")
+            conn.execute(
+                """UPDATE results SET succeeded = 0
+                WHERE coalesce(json_extract(result, '$.final_answer'), '') IN ('', 'No final answer could be generated.')
+                OR json_extract(result, '$.final_answer') LIKE 'Error:%'"""
+            )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_query_key ON results (query_key, created_at)")
+
+    def put(self, run_id: str, query: str, result_json: str, succeeded: bool = True):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO results (run_id, query, query_key, created_at, result, succeeded) VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, query, normalize_query(query), time.time(), result_json, int(succeeded)),
+        )
+
+    def get(self, run_id: str):
+        """Returns the stored result JSON of a run, or None."""
+        row = self._connect().execute("SELECT result FROM results WHERE run_id = ?", (run_id,)).fetchone()
+        return row[0] if row else None
+
+    def latest(self, query: str, max_age: float = None):
+        """Returns (run_id, result JSON) of the newest successful run of `query`, if it is at most `max_age` seconds old."""
+        min_created = time.time() - max_age if max_age else 0
+        row = self._connect().execute(
+            "SELECT run_id, result FROM results WHERE query_key = ? AND succeeded = 1 AND created_at >= ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (normalize_query(query), min_created),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def recent(self, limit: int = 20) -> list:
+        """Returns (run_id, query, created_at) of the newest runs."""
+        return self._connect().execute(
+            "SELECT run_id, query, created_at FROM results ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+_get_store = lazy_store(lambda: ResultStore(RESULT_STORE_PATH))
+
+def get_store() -> ResultStore:
+    """Returns the process-wide result store, or None when it is disabled."""
+    return _get_store() if RESULT_STORE_ENABLED else None
+
+def save_result(run_id: str, query: str, result_json: str, succeeded: bool = True):
+    """Stores a finished run and writes the optional JSON export. Only `succeeded` runs are ever reused."""
+    store = get_store()
+    if store is not None and run_id:
+        store.put(run_id, query, result_json, succeeded)
+    if RESULT_EXPORT_PATH:
+        # Write-then-rename, so a concurrent reader never sees a half-written file
+        temp_path = f"{RESULT_EXPORT_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(result_json)
+        os.replace(temp_path, RESULT_EXPORT_PATH)
+        print(f"Final result saved to {RESULT_EXPORT_PATH}")
+
+def find_recent_result(query: str, max_age: float):
+    """Returns (run_id, result JSON) of a successful answer to `query` at most `max_age` seconds old, or None."""
+    store = get_store()
+    if store is None or not max_age or max_age <= 0:
+        return None
+    return store.latest(query, max_age)
+
+def load_result(run_id: str):
+    store = get_store()
+    return store.get(run_id) if store else None
@@ -0,0 +1,120 @@
+import re
+import math
+from collections import Counter, defaultdict
+from utils.tokens import count_tokens, split_into_chunks
+from utils.config import env_int, env_bool
+
+RETRIEVAL_ENABLED = env_bool("RETRIEVAL_ENABLED", True)
+RETRIEVAL_CHUNK_TOKENS = env_int("RETRIEVAL_CHUNK_TOKENS", 300)
+RETRIEVAL_TOP_K = env_int("RETRIEVAL_TOP_K", 24)
+RETRIEVAL_TOKEN_BUDGET = env_int("RETRIEVAL_TOKEN_BUDGET", 8000)
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SOURCE_SEPARATOR = "\n\n---\n\n"
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how in is it its of on or that the
+this to was were what when where which who why will with vs versus about into than
+""".split())
+
+def tokenize(text: str) -> list:
+    """Lower-cases text and splits it into word terms, dropping stopwords."""
+    return [term for term in re.findall(r"\w+", text.lower()) if term not in STOPWORDS and len(term) > 1]
+
+class BM25Index:
+    """An in-memory inverted index over a list of chunks, scored with Okapi BM25."""
+
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.postings = defaultdict(dict)
+        self.lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk))
+            self.lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self.postings[term][chunk_id] = frequency
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, query_terms) -> dict:
+        """Returns BM25 scores for every chunk containing at least one query term."""
+        scores = defaultdict(float)
+        for term in set(query_terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for chunk_id, frequency in postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[chunk_id] / (self.average_length or 1)
+                scores[chunk_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        return scores
+
+def chunk_markdown(markdown: str, max_tokens: int = None) -> list:
+    """Splits scraped markdown into paragraph-aligned chunks for retrieval."""
+    return split_into_chunks(markdown, max_tokens or RETRIEVAL_CHUNK_TOKENS)
+
+def select_chunk_ids(chunks: list, query: str, sub_queries: list = None, top_k: int = None, token_budget: int = None) -> list:
+    """
+    Ranks `chunks` against the query and sub-queries with BM25 and returns the
+    ids of the best `top_k` that fit in `token_budget`, in ascending order.
+    Chunks that share no terms with any query (navigation, cookie banners) are
+    never kept unless nothing matches at all.
+    """
+    top_k = top_k or RETRIEVAL_TOP_K
+    token_budget = token_budget or RETRIEVAL_TOKEN_BUDGET
+    if not chunks:
+        return []
+
+    query_terms = tokenize(" ".join([query] + list(sub_queries or [])))
+    scores = BM25Index(chunks).score(query_terms)
+    if scores:
+        ranked = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+    else:
+        # Nothing matched, so keep the leading chunks rather than nothing
+        ranked = list(range(len(chunks)))
+
+    selected, used_tokens = [], 0
+    for chunk_id in ranked:
+        if len(selected) >= top_k:
+            break
+        chunk_tokens = count_tokens(chunks[chunk_id])
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.append(chunk_id)
+        used_tokens += chunk_tokens
+    return sorted(selected)
+
+def filter_relevant_chunks(chunks: list, query: str, sub_queries: list = None, top_k: int = None, token_budget: int = None) -> list:
+    """Returns the chunks most relevant to the query within the token budget, in their original order."""
+    return [chunks[chunk_id] for chunk_id in select_chunk_ids(chunks, query, sub_queries, top_k, token_budget)]
+
+def select_relevant_content(content: str, query: str, sub_queries: list = None) -> str:
+    """
+    Keeps only the passages of the joined source documents in `content` that
+    are relevant to the query, preserving the separators between sources.
+    """
+    if not RETRIEVAL_ENABLED or not content:
+        return content
+
+    sources = [source for source in content.split(SOURCE_SEPARATOR) if source.strip()]
+    tagged_chunks = [
+        (source_id, chunk)
+        for source_id, source in enumerate(sources)
+        for chunk in chunk_markdown(source)
+    ]
+    kept_ids = select_chunk_ids([chunk for _, chunk in tagged_chunks], query, sub_queries)
+
+    kept_by_source = defaultdict(list)
+    for chunk_id in kept_ids:
+        source_id, chunk = tagged_chunks[chunk_id]
+        kept_by_source[source_id].append(chunk)
+
+    selected = SOURCE_SEPARATOR.join("\n\n".join(kept_by_source[source_id]) for source_id in sorted(kept_by_source))
+    print(f"Info: Retrieval kept {len(kept_ids)} of {len(tagged_chunks)} chunks ({count_tokens(selected)} of {count_tokens(content)} tokens).")
+    return selected
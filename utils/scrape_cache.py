@@ -0,0 +1,85 @@
+import time
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from utils.disk_cache import DiskCache
+from utils.sqlite_store import lazy_store
+from utils.config import env_str, env_int, env_float, env_bool
+from utils import tracing
+
+SCRAPE_CACHE_ENABLED = env_bool("SCRAPE_CACHE_ENABLED", True)
+SCRAPE_CACHE_PATH = env_str("SCRAPE_CACHE_PATH", ".cache/scrape_cache.sqlite3")
+SCRAPE_CACHE_TTL = env_float("SCRAPE_CACHE_TTL", 24 * 3600)
+# Expired scrapes are kept this much longer, so a refresh can revalidate them instead of scraping again
+SCRAPE_CACHE_STALE_TTL = env_float("SCRAPE_CACHE_STALE_TTL", 7 * 24 * 3600)
+SCRAPE_CACHE_MAX_BYTES = env_int("SCRAPE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# Query parameters that only track the visitor and never change the page content
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so trivially different spellings of the same page share a cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    # The fragment never reaches the server, so it is dropped
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+_get_cache = lazy_store(lambda: DiskCache(SCRAPE_CACHE_PATH, SCRAPE_CACHE_MAX_BYTES, SCRAPE_CACHE_TTL))
+
+def get_cache() -> DiskCache:
+    """Returns the process-wide scrape cache, or None when caching is disabled."""
+    return _get_cache() if SCRAPE_CACHE_ENABLED else None
+
+def get_cached_scrape(url: str):
+    """Returns the cached Firecrawl data for `url`, or None on a miss."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    entry = cache.get(cache_key(url))
+    if entry and entry.get("fresh_until", float("inf")) < time.time():
+        entry = None
+    tracing.count("scrape_cache.hit" if entry else "scrape_cache.miss")
+    return entry["data"] if entry else None
+
+def get_scrape_entry(url: str):
+    """
+    Returns the whole cache entry for `url` (data, content hash and HTTP
+    validators), including one that is no longer fresh, or None.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    return cache.get(cache_key(url))
+
+def store_scrape(url: str, data: dict, ttl: float = None, validators: dict = None):
+    """
+    Caches Firecrawl data for `url` along with a hash of its markdown and the
+    page's ETag/Last-Modified `validators`, when they are known. The entry is
+    served for `ttl` seconds (default: SCRAPE_CACHE_TTL) and then kept as a
+    stale copy for another SCRAPE_CACHE_STALE_TTL.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    ttl = SCRAPE_CACHE_TTL if ttl is None else ttl
+    markdown = data.get("markdown") or ""
+    entry = {
+        "url": normalize_url(url),
+        "content_hash": hashlib.sha256(markdown.encode("utf-8")).hexdigest(),
+        "data": data,
+        "validators": validators or {},
+        "fresh_until": time.time() + ttl,
+    }
+    cache.set(cache_key(url), entry, ttl + SCRAPE_CACHE_STALE_TTL)
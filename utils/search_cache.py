@@ -0,0 +1,133 @@
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from utils.disk_cache import DiskCache
+from utils.sqlite_store import lazy_store
+from utils.config import env_str, env_int, env_float, env_bool
+
+SEARCH_CACHE_ENABLED = env_bool("SEARCH_CACHE_ENABLED", True)
+SEARCH_CACHE_TTL = env_float("SEARCH_CACHE_TTL", 900)
+SEARCH_CACHE_MAX_ENTRIES = env_int("SEARCH_CACHE_MAX_ENTRIES", 1024)
+# Optional disk tier shared between processes; disabled unless a path is set
+SEARCH_CACHE_PATH = env_str("SEARCH_CACHE_PATH", "")
+SEARCH_CACHE_MAX_BYTES = env_int("SEARCH_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+
+# Punctuation around a word; "+" and "#" stay, so "C++", "C#" and "C" remain different queries
+EDGE_PUNCTUATION_PATTERN = re.compile(r"^[^\w+#]+|[^\w+#]+$")
+
+def query_words(query: str) -> list:
+    """Splits a query into words, stripping punctuation at their edges but not inside them ("node.js")."""
+    words = (EDGE_PUNCTUATION_PATTERN.sub("", word) for word in query.split())
+    return [word for word in words if word]
+
+def normalize_query(query: str) -> str:
+    """Normalizes case, whitespace and surrounding punctuation so trivially different queries match."""
+    return " ".join(query_words(unicodedata.normalize("NFKC", query).casefold()))
+
+def cache_key(query: str, params: dict) -> str:
+    """Builds the cache key from the normalized query plus the engine parameters."""
+    key_data = {"q": normalize_query(query), **params}
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+class SearchCache:
+    """
+    A short-lived search result cache. Entries live in an in-memory LRU with a
+    TTL and, optionally, in a DiskCache tier shared with other processes.
+    Concurrent lookups of the same key are coalesced into one upstream call.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, disk: DiskCache = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key, value):
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_fetch(self, key: str, fetch):
+        """
+        Returns the cached value for `key`, otherwise calls `fetch()` once no
+        matter how many threads ask for the same key at the same time. Empty
+        results are not cached, since they usually mean the upstream call failed.
+        """
+        with self._lock:
+            value = self._get_memory(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = self.disk.get(key) if self.disk else None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+            else:
+                with self._lock:
+                    self.misses += 1
+                value = fetch()
+                if value and self.disk:
+                    self.disk.set(key, value, self.ttl)
+            if value:
+                with self._lock:
+                    self._set_memory(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+            }
+
+def _open_cache() -> SearchCache:
+    disk = DiskCache(SEARCH_CACHE_PATH, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL) if SEARCH_CACHE_PATH else None
+    return SearchCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES, disk)
+
+_get_cache = lazy_store(_open_cache)
+
+def get_cache() -> SearchCache:
+    """Returns the process-wide search cache, or None when caching is disabled."""
+    return _get_cache() if SEARCH_CACHE_ENABLED else None
@@ -0,0 +1,90 @@
+"""
+Multi-query search fan-out.
+
+One search of the user's query finds few sources, and the searches of a plan
+often return the same pages. The fan-out searches the original query and its
+sub-queries concurrently and fuses the rankings with reciprocal-rank fusion:
+a page scores 1 / (RRF_K + rank) in every ranking it appears in. Results are
+deduplicated by canonical URL, so a page found by several queries ranks
+higher but is scraped once. The fused top-N becomes the `urls` of the search
+step that the scrape steps read.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from utils.serp_api import search_web, SEARCH_TOP_N
+from utils.search_cache import normalize_query
+from utils.scrape_cache import normalize_url
+from utils.config import env_int, env_bool
+from utils import tracing
+
+SEARCH_FANOUT_ENABLED = env_bool("SEARCH_FANOUT_ENABLED", True)
+# Sub-queries generated by Gemini for the fan-out, on top of the plan's own searches
+SEARCH_SUB_QUERIES = env_int("SEARCH_SUB_QUERIES", 4)
+# Results of each query that take part in the fusion
+SEARCH_FANOUT_DEPTH = env_int("SEARCH_FANOUT_DEPTH", 10)
+# Dampens the weight of the top ranks; 60 is the constant from the original RRF paper
+RRF_K = env_int("RRF_K", 60)
+SEARCH_FANOUT_MAX_WORKERS = env_int("SEARCH_FANOUT_MAX_WORKERS", 8)
+
+def unique_queries(queries: list) -> list:
+    """Drops empty queries and queries that normalize to one already listed, keeping the order."""
+    seen = set()
+    unique = []
+    for query in queries:
+        if not isinstance(query, str) or not query.strip():
+            continue
+        key = normalize_query(query)
+        if key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+def reciprocal_rank_fusion(rankings: list, k: int = None) -> list:
+    """
+    Fuses ranked lists of search results into one, best first. Results are
+    merged by canonical URL, keeping the first result object seen for each;
+    ties keep the order in which the results were first seen.
+    """
+    k = RRF_K if k is None else k
+    scores = {}
+    results = {}
+    for ranking in rankings:
+        seen_in_ranking = set()
+        for rank, result in enumerate(ranking or [], start=1):
+            url = result.get("link") if isinstance(result, dict) else None
+            if not url:
+                continue
+            key = normalize_url(url)
+            # A page listed twice by one query only counts at its best rank
+            if key in seen_in_ranking:
+                continue
+            seen_in_ranking.add(key)
+            results.setdefault(key, result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    order = sorted(scores, key=lambda key: -scores[key])
+    return [results[key] for key in order]
+
+def fan_out_search(query: str, sub_queries: list = None, top_n: int = None, ranking=None) -> list:
+    """
+    Searches `query` and `sub_queries` concurrently and returns the top `top_n`
+    fused, deduplicated results. `ranking`, when given, is used as the
+    results of `query` instead of searching it again (e.g. a prefetch).
+    """
+    top_n = top_n or SEARCH_TOP_N
+    queries = unique_queries([query] + list(sub_queries or []))
+    if not queries:
+        return []
+    to_search = queries[1:] if ranking is not None else queries
+
+    rankings = [ranking] if ranking is not None else []
+    if to_search:
+        search = tracing.bind(lambda sub_query: search_web(sub_query, limit=SEARCH_FANOUT_DEPTH))
+        workers = max(1, min(SEARCH_FANOUT_MAX_WORKERS, len(to_search)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rankings.extend(executor.map(search, to_search))
+
+    fused = reciprocal_rank_fusion(rankings)
+    found = sum(len(ranking or []) for ranking in rankings)
+    if found > len(fused):
+        tracing.count("search.duplicate_urls", found - len(fused))
+    print(f"Info: Fanned out {len(queries)} searches; {found} results fused into {len(fused)} unique pages, keeping the top {top_n}.")
+    return fused[:top_n]
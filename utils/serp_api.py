@@ -1,26 +1,47 @@
-import os
 import requests
-from dotenv import load_dotenv
+from utils import http_client, tracing
+from utils.search_cache import get_cache, cache_key
+from utils.config import env_str, env_int
 
-load_dotenv()
+SERPER_API_KEY = env_str("SERPER_API_KEY")
+SERPAPI_URL = env_str("SERPAPI_URL", "https://serpapi.com/search")
+# Results a search step hands to the scrape steps
+SEARCH_TOP_N = env_int("SEARCH_TOP_N", 4)
 
-SERPER_API_KEY = os.getenv("SERPER_API_KEY")
-SERPAPI_URL = "https://serpapi.com/search"
-
-def search_web(query: str):
-    """Searches the web for a given query using SerpApi.com API."""
+def _fetch_organic_results(query: str, engine_params: dict):
+    """Calls SerpApi and returns the full list of organic results."""
     params = {
-        "engine": "google",
+        **engine_params,
         "q": query,
         "api_key": SERPER_API_KEY # Using the key from .env
     }
 
     try:
-        # Use GET request with params for SerpApi.com
-        response = requests.get(SERPAPI_URL, params=params)
+        # Use GET request with params for SerpApi.com over the pooled session
+        response = http_client.get("serpapi", SERPAPI_URL, params=params)
         response.raise_for_status()
         # SerpApi.com uses 'organic_results' key for search results
-        return response.json().get('organic_results', [])[:2] # Get top 2 results
+        return response.json().get('organic_results', [])
     except requests.exceptions.RequestException as e:
         print(f"Error calling SerpApi: {e}")
         return []
+
+def search_web(query: str, use_cache: bool = True, limit: int = None):
+    """
+    Searches the web for a given query using SerpApi.com API and returns the
+    top `limit` results (default: SEARCH_TOP_N). The cache keeps all of them.
+    """
+    engine_params = {"engine": "google"}
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        results = _fetch_organic_results(query, engine_params)
+    else:
+        fetched = []
+
+        def fetch():
+            fetched.append(True)
+            return _fetch_organic_results(query, engine_params)
+
+        results = cache.get_or_fetch(cache_key(query, engine_params), fetch)
+        tracing.count("search_cache.miss" if fetched else "search_cache.hit")
+    return results[:limit or SEARCH_TOP_N]
@@ -0,0 +1,52 @@
+"""
+Shared plumbing of the SQLite-backed stores: the disk caches, the blob index,
+the result and checkpoint stores and the job store.
+
+sqlite3 connections cannot be shared across threads, so every thread opens
+its own. WAL mode and a busy timeout make one file safe to share between
+threads and between processes on the same host, with readers never blocked
+by a writer.
+"""
+import os
+import sqlite3
+import threading
+
+# Seconds a connection waits for another writer before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = 30
+
+class SQLiteStore:
+    """Base class of a store kept in the SQLite file at `path`, with one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement updates open their own transaction
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+def lazy_store(factory):
+    """
+    Returns a function that creates the process-wide store with `factory()` on
+    its first call and returns that same store on every call after.
+    """
+    store = None
+    lock = threading.Lock()
+
+    def get_store():
+        nonlocal store
+        with lock:
+            if store is None:
+                store = factory()
+            return store
+
+    return get_store
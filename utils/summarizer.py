@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+from utils.gemini_api import call_gemini, call_gemini_streaming
+from utils.tokens import count_tokens, truncate_to_tokens, split_into_chunks
+from utils.config import env_int
+from utils import tracing
+
+# Largest prompt body sent to Gemini in one call
+SUMMARY_CHUNK_TOKENS = env_int("SUMMARY_CHUNK_TOKENS", 12000)
+# Parallel Gemini calls during the map phase
+SUMMARY_MAX_WORKERS = env_int("SUMMARY_MAX_WORKERS", 4)
+# Content beyond this many tokens is dropped before summarizing
+SUMMARY_TOTAL_TOKENS = env_int("SUMMARY_TOTAL_TOKENS", 200000)
+
+def build_report_prompt(content: str) -> str:
+    """Builds the final research report prompt over the provided content."""
+    return f"""You are a professional research analyst. Your task is to produce a comprehensive, detailed, and well-structured research report based on the provided text content. The report should be objective and synthesize information from all provided sources.
+
+**Instructions:**
+1.  **Do not invent information.** Base your entire report on the text provided below.
+2.  **Structure the report** with the following sections: Executive Summary, Key Findings (in bullet points), Detailed Analysis, and Conclusion.
+3.  **Write in a clear, professional tone.**
+4.  **Ensure the report is detailed and thorough.**
+
+**Provided Content to Synthesize:**
+---
+{content}
+---
+
+**Begin Research Report:**
+"""
+
+def build_chunk_prompt(content: str) -> str:
+    """Builds the map-phase prompt that condenses one chunk into research notes."""
+    return f"""You are a research assistant. Extract every fact, figure, claim and conclusion from the text below into detailed bullet-point notes. Keep names, numbers and dates exact.
+
+**Instructions:**
+1.  **Do not invent information.** Only use the text provided below.
+2.  **Do not write an introduction or conclusion.** Return only the notes.
+
+**Text:**
+---
+{content}
+---
+
+**Notes:**
+"""
+
+def _map_chunks(chunks: list, max_workers: int) -> list:
+    """Condenses every chunk into notes in parallel, dropping chunks whose call failed."""
+    prompts = [build_chunk_prompt(chunk) for chunk in chunks]
+    workers = max(1, min(max_workers, len(prompts)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        notes = list(executor.map(tracing.bind(call_gemini), prompts))
+    return [note for note in notes if note]
+
+def summarize_content(content: str, chunk_tokens: int = None, max_workers: int = None, total_tokens: int = None, on_token=None):
+    """
+    Produces a research report from `content` with a token-budgeted map-reduce.
+    Content that fits in one chunk is summarized in a single call. Larger content
+    is split into chunks that are condensed in parallel (map), and the notes are
+    merged into the report (reduce), condensing again while they are still too
+    large for one call. If `on_token` is given, the final report is streamed to
+    it fragment by fragment. Returns None if Gemini fails.
+    """
+    chunk_tokens = chunk_tokens or SUMMARY_CHUNK_TOKENS
+    max_workers = max_workers or SUMMARY_MAX_WORKERS
+    total_tokens = total_tokens or SUMMARY_TOTAL_TOKENS
+
+    if count_tokens(content) > total_tokens:
+        print(f"Info: Content exceeds the {total_tokens}-token summary budget. Truncating.")
+        content = truncate_to_tokens(content, total_tokens)
+
+    chunks = split_into_chunks(content, chunk_tokens)
+    while len(chunks) > 1:
+        print(f"Info: Summarizing {len(chunks)} chunks of up to {chunk_tokens} tokens in parallel.")
+        notes = _map_chunks(chunks, max_workers)
+        if not notes:
+            return None
+        merged_notes = "\n\n---\n\n".join(notes)
+        merged_chunks = split_into_chunks(merged_notes, chunk_tokens)
+        if len(merged_chunks) >= len(chunks):
+            # The notes stopped shrinking, so keep what fits into the final call
+            merged_chunks = [truncate_to_tokens(merged_notes, chunk_tokens)]
+        chunks = merged_chunks
+
+    if not chunks:
+        return None
+    if on_token is not None:
+        return call_gemini_streaming(build_report_prompt(chunks[0]), on_token)
+    return call_gemini(build_report_prompt(chunks[0]))
@@ -0,0 +1,81 @@
+import re
+import threading
+from utils.config import env_str
+
+TOKEN_ENCODING = env_str("TOKEN_ENCODING", "cl100k_base")
+# Used when tiktoken or its encoding file is unavailable (e.g. offline workers)
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def get_encoding():
+    """Returns the tiktoken encoding, loading it on first use, or None if it is unavailable."""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                print(f"Warning: tiktoken encoding '{TOKEN_ENCODING}' unavailable ({type(e).__name__}). Estimating token counts.")
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens in `text`."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Returns the longest prefix of `text` that fits in `max_tokens`."""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def _split_oversized(text: str, max_tokens: int) -> list:
+    """Splits a single block that is larger than `max_tokens` into token-sized slices."""
+    encoding = get_encoding()
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+def split_into_chunks(text: str, max_tokens: int) -> list:
+    """
+    Splits `text` into chunks of at most `max_tokens`, packing whole paragraphs
+    together and only cutting inside a paragraph when it is too large on its own.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = count_tokens(paragraph)
+        if paragraph_tokens > max_tokens:
+            pieces = _split_oversized(paragraph, max_tokens)
+        else:
+            pieces = [paragraph]
+        for piece in pieces:
+            piece_tokens = paragraph_tokens if len(pieces) == 1 else count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -0,0 +1,197 @@
+"""
+Lightweight per-run tracing.
+
+Each research run gets a Trace, registered by run id. Graph nodes, plan steps
+and external calls record spans into it (a `perf_counter_ns` pair and a list
+append, so it is cheap enough to leave on). Once the run ends the trace can be
+written as Chrome trace-event JSON, viewable in Perfetto or chrome://tracing,
+and condensed into a summary for the run's output.
+"""
+import os
+import json
+import time
+import inspect
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from utils.config import env_str, env_int, env_bool
+
+TRACING_ENABLED = env_bool("TRACING_ENABLED", True)
+# Directory for Chrome trace files, one per run and never pruned; empty (the default) disables the export
+TRACE_EXPORT_DIR = env_str("TRACE_EXPORT_DIR", "")
+# Spans beyond this are dropped so a runaway run cannot grow its trace without bound
+TRACE_MAX_SPANS = env_int("TRACE_MAX_SPANS", 10000)
+
+class Trace:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started_ns = time.perf_counter_ns()
+        self.spans = []
+        self.counters = defaultdict(int)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, category: str, start_ns: int, end_ns: int, attrs: dict):
+        with self._lock:
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return
+            self.spans.append((name, category, start_ns, end_ns, threading.get_ident(), attrs))
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def to_chrome_events(self) -> list:
+        """Converts the spans to Chrome trace-event "complete" (ph=X) events."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        return [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start_ns - self.started_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": attrs,
+            }
+            for name, category, start_ns, end_ns, tid, attrs in spans
+        ]
+
+    def summary(self) -> dict:
+        """Aggregates spans by node, step action and provider."""
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        nodes = defaultdict(float)
+        steps = defaultdict(lambda: {"count": 0, "total_ms": 0.0})
+        calls = defaultdict(lambda: {"count": 0, "errors": 0, "total_ms": 0.0, "request_bytes": 0, "response_bytes": 0})
+        tokens = defaultdict(int)
+        for name, category, start_ns, end_ns, _, attrs in spans:
+            duration_ms = (end_ns - start_ns) / 1e6
+            if category == "node":
+                nodes[name] += duration_ms
+            elif category == "step":
+                action = steps[attrs.get("action", name)]
+                action["count"] += 1
+                action["total_ms"] += duration_ms
+            elif category == "http":
+                call = calls[attrs.get("provider", name)]
+                call["count"] += 1
+                call["total_ms"] += duration_ms
+                call["request_bytes"] += attrs.get("request_bytes", 0)
+                call["response_bytes"] += attrs.get("response_bytes", 0)
+                if attrs.get("error") or attrs.get("status", 200) >= 400:
+                    call["errors"] += 1
+            for key in ("prompt_tokens", "output_tokens"):
+                tokens[key] += attrs.get(key, 0)
+        return {
+            "run_id": self.run_id,
+            "elapsed_ms": round((time.perf_counter_ns() - self.started_ns) / 1e6, 1),
+            "nodes_ms": {name: round(value, 1) for name, value in nodes.items()},
+            "steps": {name: {**value, "total_ms": round(value["total_ms"], 1)} for name, value in steps.items()},
+            "calls": {name: {**value, "total_ms": round(value["total_ms"], 1)} for name, value in calls.items()},
+            "tokens": dict(tokens),
+            "counters": counters,
+            "dropped_spans": self.dropped,
+        }
+
+_traces = {}
+_traces_lock = threading.Lock()
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def start_trace(run_id: str):
+    """Creates and registers the trace for a run (None when tracing is disabled)."""
+    if not TRACING_ENABLED or not run_id:
+        return None
+    trace = Trace(run_id)
+    with _traces_lock:
+        _traces[run_id] = trace
+    return trace
+
+def get_trace(run_id: str):
+    with _traces_lock:
+        return _traces.get(run_id)
+
+def finish_trace(run_id: str):
+    """Unregisters a run's trace and writes its Chrome trace file when exporting is on. Returns the file path."""
+    with _traces_lock:
+        trace = _traces.pop(run_id, None)
+    if trace is None or not TRACE_EXPORT_DIR:
+        return None
+    os.makedirs(TRACE_EXPORT_DIR, exist_ok=True)
+    path = os.path.join(TRACE_EXPORT_DIR, f"{run_id}.json")
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace.to_chrome_events(), "displayTimeUnit": "ms", "otherData": trace.summary()}, f)
+    print(f"Info: Wrote the trace of run {run_id} to {path}.")
+    return path
+
+def summarize(run_id: str):
+    trace = get_trace(run_id)
+    return trace.summary() if trace else None
+
+@contextmanager
+def activate(trace):
+    """Makes `trace` the current trace for spans recorded in this thread."""
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str, category: str = "function", **attrs):
+    """
+    Records a span around the block into the current trace. The yielded dict
+    can be filled with attributes (bytes, tokens, status) before the block ends.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    start_ns = time.perf_counter_ns()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add_span(name, category, start_ns, time.perf_counter_ns(), attrs)
+
+def count(name: str, value: int = 1):
+    """Increments a counter (e.g. cache hits) on the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, value)
+
+def bind(fn):
+    """Wraps `fn` so it records into the caller's trace when run on another thread."""
+    trace = _current_trace.get()
+    if trace is None:
+        return fn
+
+    @wraps(fn)
+    def bound(*args, **kwargs):
+        with activate(trace):
+            return fn(*args, **kwargs)
+    return bound
+
+def traced_node(name: str, node):
+    """Wraps a graph node so it runs under its run's trace inside a `node` span."""
+    accepts_config = "config" in inspect.signature(node).parameters
+
+    # Not functools.wraps: LangGraph inspects the signature to decide whether to pass
+    # `config`, and the wrapper must always receive it
+    def wrapper(state, config=None):
+        trace = get_trace(state.get("run_id"))
+        if trace is None:
+            return node(state, config) if accepts_config else node(state)
+        with activate(trace), span(name, "node"):
+            return node(state, config) if accepts_config else node(state)
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper